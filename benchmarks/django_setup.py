@@ -0,0 +1,15 @@
+"""Подключение Django для скриптов из benchmarks/.
+
+Импортируется первым: добавляет проект в ``sys.path`` и настраивает
+``benchmarks.settings``.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'yatube')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
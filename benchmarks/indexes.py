@@ -0,0 +1,192 @@
+"""Планы EXPLAIN и задержки горячих запросов лент до и после индексов.
+
+Запуск из корня репозитория::
+
+    python benchmarks/indexes.py --posts 1000000 --json indexes.json
+
+База засевается один раз (файл ``--db``) и переиспользуется. «До» —
+схема ``posts`` на миграции 0012, без составных индексов; «после» —
+все миграции применены.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+BEFORE_MIGRATION = '0012_post_comments_count'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--db', default=None,
+                        help='файл SQLite (по умолчанию benchmarks/)')
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=200_000)
+    parser.add_argument('--follows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--reseed', action='store_true',
+                        help='пересоздать базу')
+    parser.add_argument('--json', dest='json_path',
+                        help='куда записать результаты')
+    return parser.parse_args()
+
+
+def chunks(rows, size=10_000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed(connection, args):
+    """Засевает базу сырыми INSERT: сигналы и модели здесь не нужны."""
+    rnd = random.Random(42)
+    start = datetime(2020, 1, 1)
+    span = int(timedelta(days=3 * 365).total_seconds())
+
+    def moment():
+        return str(start + timedelta(seconds=rnd.randrange(span),
+                                     microseconds=rnd.randrange(10 ** 6)))
+
+    tables = {
+        'auth_user': (
+            '(password, is_superuser, username, first_name, last_name, '
+            'email, is_staff, is_active, date_joined)',
+            (('!', False, f'user{i}', 'Имя', f'Фамилия{i}', '', False,
+              True, moment()) for i in range(args.users)),
+        ),
+        'posts_group': (
+            '(title, slug, description)',
+            ((f'Группа {i}', f'group-{i}', 'Описание')
+             for i in range(args.groups)),
+        ),
+        'posts_post': (
+            '(text, pub_date, author_id, group_id, image, comments_count)',
+            ((f'Пост {i}', moment(), rnd.randint(1, args.users),
+              rnd.choice((None, rnd.randint(1, args.groups))), '', 0)
+             for i in range(args.posts)),
+        ),
+        'posts_comment': (
+            '(post_id, author_id, text, created)',
+            ((rnd.randint(1, args.posts), rnd.randint(1, args.users),
+              'Комментарий', moment()) for _ in range(args.comments)),
+        ),
+        'posts_follow': (
+            '(user_id, author_id)',
+            # Без повторов: иначе не применится уникальное ограничение
+            ({(rnd.randint(1, args.users), rnd.randint(1, args.users))
+              for _ in range(args.follows)}),
+        ),
+    }
+    with connection.cursor() as cursor:
+        for table, (columns, rows) in tables.items():
+            placeholders = ', '.join(['%s'] * (columns.count(',') + 1))
+            sql = f'INSERT INTO {table} {columns} VALUES ({placeholders})'
+            for chunk in chunks(rows):
+                cursor.executemany(sql, chunk)
+            print(f'{table}: засеяно', file=sys.stderr)
+
+
+def hot_queries():
+    from core.paginator import NEXT, CursorPaginator
+    from posts.models import Comment, Follow, Post
+
+    middle = Post.objects.order_by('-pub_date', '-pk')[
+        Post.objects.count() // 2
+    ]
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    follow = Follow.objects.order_by('pk').first()
+    paginator = CursorPaginator(Post.objects.for_feed(), 10)
+    page = paginator.window(None, NEXT)
+    return {
+        'index: первая страница': page[:11],
+        'index: страница из середины': paginator.window(
+            [middle.pub_date, middle.pk], NEXT
+        )[:11],
+        'group_list': page.filter(group_id=middle.group_id or 1)[:11],
+        'profile': page.filter(author_id=middle.author_id)[:11],
+        'post_detail: комментарии': Comment.objects.filter(
+            post_id=post.pk
+        ).order_by('created')[:50],
+        'profile: подписан ли': Follow.objects.filter(
+            user_id=follow.user_id, author_id=follow.author_id
+        )[:1],
+    }
+
+
+def measure(connection, queries, repeat):
+    results = {}
+    with connection.cursor() as cursor:
+        for name, queryset in queries.items():
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = {
+                'plan': plan,
+                'median_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            }
+    return results
+
+
+def main():
+    args = parse_args()
+    if args.db:
+        os.environ['BENCH_DB'] = os.path.abspath(args.db)
+    from django_setup import django  # noqa: F401
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    db_path = settings.DATABASES['default']['NAME']
+    if args.reseed and os.path.exists(db_path):
+        os.remove(db_path)
+    fresh = not os.path.exists(db_path)
+    call_command('migrate', verbosity=0)
+    call_command('migrate', 'posts', BEFORE_MIGRATION, verbosity=0)
+    if fresh:
+        seed(connection, args)
+
+    report = {}
+    for phase in ('before', 'after'):
+        if phase == 'after':
+            started = time.perf_counter()
+            call_command('migrate', verbosity=0)
+            print(f'Индексы построены за '
+                  f'{time.perf_counter() - started:.1f} с', file=sys.stderr)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        report[phase] = measure(connection, hot_queries(), args.repeat)
+
+    for name in report['before']:
+        print(f'\n== {name}')
+        for phase in ('before', 'after'):
+            result = report[phase][name]
+            print(f'  {phase:6} median {result["median_ms"]:>9} ms, '
+                  f'p95 {result["p95_ms"]:>9} ms')
+            for line in result['plan']:
+                print(f'           {line}')
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Задержки и число SQL-запросов по всем адресам posts и users.
+
+Запуск из корня репозитория::
+
+    python benchmarks/load.py --posts 20000 --json load.json
+    python benchmarks/load.py --json new.json --compare load.json
+
+База каждый раз создаётся заново в файле ``--db``: пользователи, группы,
+посты, комментарии и подписки с текстами Faker загружаются через
+``posts.transfer`` одним проходом, читатель и автор для сценариев
+создаются ``mixer`` с обычными сигналами. Каждый сценарий — адрес,
+метод и зритель (аноним, читатель или автор) — прогоняется через
+тестовый клиент Django; первые ``--warmup`` запросов не считаются.
+Если для адреса из ``posts/urls.py`` или ``users/urls.py`` нет
+сценария, бенчмарк падает, а не молча его пропускает.
+
+С ``--cold`` перед каждым запросом очищаются кэши лент и ответов:
+так видна цена промаха, а не чтения из кэша.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+NAMESPACES = ('posts', 'users')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--db', default=None,
+                        help='файл SQLite (по умолчанию benchmarks/)')
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--comments', type=int, default=40_000)
+    parser.add_argument('--follows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='замеров на сценарий')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cold', action='store_true',
+                        help='очищать кэши перед каждым запросом')
+    parser.add_argument('--only', action='append', default=[],
+                        help='гонять только сценарии с этой подстрокой')
+    parser.add_argument('--json', dest='json_path',
+                        help='куда записать результаты')
+    parser.add_argument('--compare', dest='compare_path',
+                        help='прошлый JSON для сравнения')
+    return parser.parse_args()
+
+
+def rows(args):
+    """Строки для ``transfer.Importer``: таблица и запись."""
+    from django.utils import timezone
+    from faker import Faker
+
+    fake = Faker('ru_RU')
+    fake.seed_instance(42)
+    rnd = random.Random(42)
+    now = timezone.now()
+    span = int(timedelta(days=3 * 365).total_seconds())
+
+    def moment():
+        return now - timedelta(seconds=rnd.randrange(span))
+
+    usernames = [f'{fake.user_name()}{i}' for i in range(args.users)]
+    slugs = [f'{fake.slug()}-{i}' for i in range(args.groups)]
+    for username in usernames:
+        yield 'users', {
+            'username': username, 'first_name': fake.first_name(),
+            'last_name': fake.last_name(), 'date_joined': moment(),
+        }
+    for slug in slugs:
+        yield 'groups', {
+            'slug': slug, 'title': fake.sentence(nb_words=3)[:200],
+            'description': fake.paragraph(),
+        }
+    for pk in range(1, args.posts + 1):
+        yield 'posts', {
+            'id': pk, 'author': rnd.choice(usernames),
+            'group': rnd.choice((None, rnd.choice(slugs) if slugs else None)),
+            'text': fake.text(max_nb_chars=rnd.choice((80, 400, 1500))),
+            'pub_date': moment(), 'image': '',
+        }
+    for pk in range(1, args.comments + 1):
+        yield 'comments', {
+            'id': pk, 'post': rnd.randint(1, args.posts),
+            'author': rnd.choice(usernames),
+            'text': fake.sentence(nb_words=rnd.randint(3, 30)),
+            'created': moment(),
+        }
+    # Авторы популярны неравномерно, как в жизни
+    for _ in range(args.follows):
+        yield 'follows', {
+            'user': rnd.choice(usernames),
+            'author': usernames[int(rnd.paretovariate(1.2)) % args.users],
+        }
+
+
+def seed(args):
+    from django.db.models import Count
+    from mixer.backend.django import mixer
+    from posts import transfer
+    from posts.models import Follow, Post, User
+
+    started = time.perf_counter()
+    importer = transfer.Importer()
+    for name, row in rows(args):
+        importer.add(name, row)
+    importer.flush()
+    # Читатель подписан на самых плодовитых авторов
+    reader = mixer.blend(User, username='bench_reader')
+    authors = User.objects.annotate(total=Count('posts')).order_by(
+        '-total'
+    ).values_list('pk', flat=True)[:50]
+    Follow.objects.bulk_create(
+        Follow(user=reader, author_id=author_id) for author_id in authors
+    )
+    author = mixer.blend(User, username='bench_author')
+    mixer.cycle(30).blend(Post, author=author, group=mixer.SELECT,
+                          image='', text=mixer.FAKE)
+    transfer.rebuild_derived()
+    print(f'Засеяно за {time.perf_counter() - started:.1f} с: '
+          + ', '.join(f'{name} {count}'
+                      for name, count in importer.loaded.items()),
+          file=sys.stderr)
+    return reader, author
+
+
+def scenarios(reader, author):
+    """Сценарии: (адрес, зритель, метод, аргументы, данные, подготовка).
+
+    Подготовка выполняется перед каждым запросом и не замеряется.
+    """
+    from django.contrib.auth.tokens import default_token_generator
+    from django.db.models import Count
+    from django.utils.encoding import force_bytes
+    from django.utils.http import urlsafe_base64_encode
+    from posts.models import Follow, Group, Post
+
+    group = Group.objects.annotate(total=Count('posts')).latest('total')
+    post = Post.objects.latest('comments_count')
+    own_post = author.posts.latest('pub_date')
+    word = post.text.split()[0].strip('.,')
+    uid = urlsafe_base64_encode(force_bytes(reader.pk))
+    token = default_token_generator.make_token(reader)
+
+    def unfollow(client):
+        Follow.objects.filter(user=reader, author=author).delete()
+
+    def follow(client):
+        Follow.objects.get_or_create(user=reader, author=author)
+
+    def login(client):
+        client.force_login(reader)
+
+    feeds = (
+        ('posts:index', (), {}),
+        ('posts:search', (), {'q': word}),
+        ('posts:group_list', (group.slug,), {}),
+        ('posts:profile', (author.username,), {}),
+        ('posts:post_detail', (post.pk,), {}),
+        ('posts:comments', (post.pk,), {}),
+        ('posts:followers', (author.username,), {}),
+        ('posts:following', (reader.username,), {}),
+    )
+    for name, url_args, data in feeds:
+        for viewer in ('anon', 'reader'):
+            yield name, viewer, 'get', url_args, data, None
+    yield 'posts:follow_index', 'reader', 'get', (), {}, None
+    yield 'posts:post_create', 'author', 'get', (), {}, None
+    yield 'posts:post_create', 'author', 'post', (), {
+        'text': 'Пост из бенчмарка', 'group': group.pk,
+    }, None
+    yield 'posts:post_edit', 'author', 'get', (own_post.pk,), {}, None
+    yield 'posts:post_edit', 'author', 'post', (own_post.pk,), {
+        'text': 'Правка из бенчмарка', 'group': group.pk,
+    }, None
+    yield 'posts:add_comment', 'reader', 'post', (post.pk,), {
+        'text': 'Комментарий из бенчмарка',
+    }, None
+    yield ('posts:profile_follow', 'reader', 'get', (author.username,), {},
+           unfollow)
+    yield ('posts:profile_unfollow', 'reader', 'get', (author.username,), {},
+           follow)
+    for name in ('signup', 'login', 'password_reset', 'password_reset_done',
+                 'password_reset_complete'):
+        yield f'users:{name}', 'anon', 'get', (), {}, None
+    yield ('users:password_reset_confirm', 'anon', 'get', (uid, token), {},
+           None)
+    for name in ('password_change', 'password_change_done'):
+        yield f'users:{name}', 'reader', 'get', (), {}, None
+    yield 'users:logout', 'reader', 'get', (), {}, login
+
+
+def uncovered(names):
+    """Адреса из ``NAMESPACES``, для которых нет сценария."""
+    from django.urls import get_resolver
+
+    routes = {
+        f'{resolver.namespace}:{pattern.name}'
+        for resolver in get_resolver().url_patterns
+        if getattr(resolver, 'namespace', None) in NAMESPACES
+        for pattern in resolver.url_patterns
+    }
+    return sorted(routes - set(names))
+
+
+def percentile(timings, share):
+    """Значение ранга ``share`` в отсортированном списке."""
+    return timings[max(math.ceil(share * len(timings)) - 1, 0)]
+
+
+def run(scenario, clients, args):
+    from core import response_cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from posts import cache
+
+    name, viewer, method, url_args, data, prepare = scenario
+    client = clients[viewer]
+    url = reverse(name, args=url_args)
+    timings, queries, sql, statuses = [], [], [], set()
+    for attempt in range(args.warmup + args.repeat):
+        if prepare:
+            prepare(client)
+        if args.cold:
+            cache.get_cache().clear()
+            response_cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - started
+        if attempt < args.warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(len(context.captured_queries))
+        sql.append(sum(float(query['time'])
+                       for query in context.captured_queries) * 1000)
+        statuses.add(response.status_code)
+    timings.sort()
+    return {
+        'url': url,
+        'status': sorted(statuses),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql), 3),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def metadata(args):
+    import django
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        **{name: getattr(args, name) for name in (
+            'users', 'groups', 'posts', 'comments', 'follows',
+            'repeat', 'warmup', 'cold',
+        )},
+    }
+
+
+def compare(report, path):
+    with open(path) as source:
+        previous = json.load(source)
+    print(f'\nСравнение с {previous["meta"].get("commit") or path}:')
+    for key, result in report['routes'].items():
+        old = previous['routes'].get(key)
+        if old is None:
+            print(f'  {key:50} новый сценарий')
+            continue
+        change = (result['p50_ms'] / old['p50_ms'] - 1) * 100
+        print(f'  {key:50} p50 {old["p50_ms"]:>8} → {result["p50_ms"]:>8} '
+              f'мс ({change:+.0f}%), запросов '
+              f'{old["queries"]} → {result["queries"]}')
+
+
+def main():
+    args = parse_args()
+    db_path = os.path.abspath(args.db or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'load.sqlite3'
+    ))
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ['BENCH_DB'] = db_path
+    from django_setup import django  # noqa: F401
+    from django.core.management import call_command
+    from django.test import Client
+
+    call_command('migrate', verbosity=0)
+    reader, author = seed(args)
+    clients = {'anon': Client(), 'reader': Client(), 'author': Client()}
+    clients['reader'].force_login(reader)
+    clients['author'].force_login(author)
+    # После входа: токен сброса пароля зависит от last_login
+    plan = list(scenarios(reader, author))
+    missing = uncovered(name for name, *_ in plan)
+    if missing:
+        sys.exit(f'Нет сценариев для адресов: {", ".join(missing)}')
+
+    report = {'meta': metadata(args), 'routes': {}}
+    for scenario in plan:
+        name, viewer, method = scenario[:3]
+        key = f'{name} {method.upper()} {viewer}'
+        if args.only and not any(part in key for part in args.only):
+            continue
+        result = run(scenario, clients, args)
+        report['routes'][key] = result
+        print(f'{key:50} p50 {result["p50_ms"]:>8} мс, '
+              f'p95 {result["p95_ms"]:>8} мс, '
+              f'p99 {result["p99_ms"]:>8} мс, '
+              f'{result["queries"]:>3} запр., {result["status"]}')
+    if args.compare_path:
+        compare(report, args.compare_path)
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Скорость индексации постов для полнотекстового поиска, постов/с.
+
+Запуск из корня репозитория::
+
+    python benchmarks/search_indexing.py --posts 20000 --json search.json
+
+Меряются три вещи: разбор текста (``posts.analysis.analyze``),
+полная перестройка индекса (``rebuild``) и обновление индекса по
+одному посту (``index``), как это делают сигналы, — каждый в своей
+транзакции. База каждый раз создаётся заново в файле ``--db``.
+
+Словарь синтетических текстов мал, поэтому почти все основы берутся из
+кэша стеммера; на живых текстах разбор медленнее.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Слова в разных формах, чтобы стеммеру было что делать
+WORDS = '''
+    кот кота коту котом коты котов котами кошка кошки кошкой кошек
+    город города городе городами улица улицы улицей улицах дом дома домов
+    гулять гуляли гуляла гуляет гуляющий прогулка прогулки прогулкой
+    читать читали читает прочитанный книга книги книгой книгам
+    красивый красивая красивые красивейший важный важнейшие важно
+    программирование программировать программист программистами
+    конференция конференции конференциях известность известный
+    писать написал написанный пишет письмо письма письмами
+    и в на с по не а но что как это для от до из у о
+'''.split()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--db', default=None,
+                        help='файл SQLite (по умолчанию benchmarks/)')
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--words', type=int, default=60,
+                        help='слов в посте')
+    parser.add_argument('--comments', type=int, default=2,
+                        help='комментариев на пост')
+    parser.add_argument('--incremental', type=int, default=1_000,
+                        help='сколько постов индексировать по одному')
+    parser.add_argument('--json', dest='json_path',
+                        help='куда записать результаты')
+    return parser.parse_args()
+
+
+def texts(rnd, count, words):
+    for _ in range(count):
+        yield ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(connection, args):
+    rnd = random.Random(42)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO auth_user (password, is_superuser, username, "
+            "first_name, last_name, email, is_staff, is_active, date_joined) "
+            "VALUES ('!', 0, 'bench', '', '', '', 0, 1, '2020-01-01')"
+        )
+        cursor.executemany(
+            'INSERT INTO posts_post (id, text, pub_date, author_id, image, '
+            "comments_count) VALUES (%s, %s, '2020-01-01', 1, '', 0)",
+            list(enumerate(texts(rnd, args.posts, args.words), 1)),
+        )
+        cursor.executemany(
+            'INSERT INTO posts_comment (post_id, author_id, text, created) '
+            "VALUES (%s, 1, %s, '2020-01-01')",
+            [
+                (i % args.posts + 1, text) for i, text in enumerate(
+                    texts(rnd, args.posts * args.comments, args.words // 4)
+                )
+            ],
+        )
+
+
+def rate(count, seconds):
+    return {
+        'posts': count,
+        'seconds': round(seconds, 3),
+        'posts_per_sec': round(count / seconds) if seconds else None,
+    }
+
+
+def main():
+    args = parse_args()
+    db_path = os.path.abspath(args.db or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'search.sqlite3'
+    ))
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ['BENCH_DB'] = db_path
+    from django_setup import django  # noqa: F401
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from posts.analysis import analyze
+    from posts.models import Post
+    from posts.search import SQLiteSearchBackend
+
+    call_command('migrate', verbosity=0)
+    with transaction.atomic():
+        seed(connection, args)
+    print(f'Засеяно постов: {args.posts}', file=sys.stderr)
+    backend = SQLiteSearchBackend()
+    report = {}
+
+    rows = list(Post.objects.values_list('text', flat=True))
+    started = time.perf_counter()
+    for text in rows:
+        analyze(text)
+    report['analyze'] = rate(len(rows), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        backend.rebuild()
+    report['rebuild'] = rate(args.posts, time.perf_counter() - started)
+
+    posts = list(Post.objects.order_by('?')[:args.incremental])
+    started = time.perf_counter()
+    for post in posts:
+        with transaction.atomic():
+            backend.index(post)
+    report['index'] = rate(len(posts), time.perf_counter() - started)
+
+    for name, result in report.items():
+        print(f'{name:8} {result["posts_per_sec"]:>8} постов/с '
+              f'({result["posts"]} за {result["seconds"]} с)')
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""Настройки для бенчмарков: отдельная база, чтобы не трогать рабочую."""
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB', os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'bench.sqlite3'
+        )),
+    }
+}
+
+# Тестовый клиент ходит на testserver; письма сброса пароля не нужны
+ALLOWED_HOSTS = [*ALLOWED_HOSTS, 'testserver']  # noqa: F405
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -0,0 +1,149 @@
+"""Время рендера шаблонов страниц лент с кэшем шаблонов и без него.
+
+Запуск из корня репозитория::
+
+    python benchmarks/templates.py --repeat 200 --json templates.json
+
+Контекст каждой страницы (index, group_list, profile, post_detail,
+follow) берётся из ответа тестового клиента, затем шаблон рендерится
+``render_to_string`` в трёх режимах:
+
+* ``uncached`` — загрузчики без кэша, как было: каждый рендер читает
+  и разбирает с диска страницу, ``base.html`` и все ``includes``;
+* ``cold`` — кэширующий загрузчик, первый рендер после сброса кэша;
+* ``warm`` — кэширующий загрузчик после ``template_warmup.warm()``.
+
+Запросы к базе в замер не входят: страницы в контексте уже выбраны.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import load
+
+PAGES = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--db', default=None,
+                        help='файл SQLite (по умолчанию benchmarks/)')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', dest='json_path',
+                        help='куда записать результаты')
+    args = parser.parse_args()
+    # Объёмы для засева: страницам хватит небольших
+    args.users, args.groups, args.posts = 200, 10, 2_000
+    args.comments, args.follows = 4_000, 1_000
+    return args
+
+
+def page_contexts(reader, author):
+    """(шаблон, контекст, запрос) для каждой страницы ленты."""
+    from django.db.models import Count
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from posts.models import Group, Post
+
+    setup_test_environment()
+    client = Client()
+    client.force_login(reader)
+    group = Group.objects.annotate(total=Count('posts')).latest('total')
+    post = Post.objects.latest('comments_count')
+    urls = {
+        'index': reverse('posts:index'),
+        'group_list': reverse('posts:group_list', args=(group.slug,)),
+        'profile': reverse('posts:profile', args=(author.username,)),
+        'post_detail': reverse('posts:post_detail', args=(post.pk,)),
+        'follow_index': reverse('posts:follow_index'),
+    }
+    contexts = {}
+    for name in PAGES:
+        response = client.get(urls[name])
+        context = response.context[0].flatten()
+        # Ленивые страницы выбираются один раз, а не при каждом рендере
+        if 'page_obj' in context:
+            context['page_obj'].object_list = list(
+                context['page_obj'].object_list
+            )
+        contexts[name] = (
+            response.templates[0].name, context, response.wsgi_request
+        )
+    return contexts
+
+
+def templates_setting(cached):
+    from django.conf import settings
+
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    engine = dict(settings.TEMPLATES[0])
+    engine['OPTIONS'] = dict(
+        engine['OPTIONS'],
+        loaders=[('django.template.loaders.cached.Loader', loaders)]
+        if cached else loaders,
+    )
+    return [engine]
+
+
+def measure(contexts, repeat):
+    from core import template_warmup
+    from django.template.loader import render_to_string
+    from django.test import override_settings
+
+    report = {name: {} for name in contexts}
+    for mode in ('uncached', 'cold', 'warm'):
+        cached = mode != 'uncached'
+        with override_settings(TEMPLATES=templates_setting(cached)):
+            if mode == 'warm':
+                template_warmup.warm()
+            for name, (template, context, request) in contexts.items():
+                timings = []
+                for _ in range(1 if mode == 'cold' else repeat):
+                    if mode == 'cold':
+                        loaders = template_warmup.get_engine().template_loaders
+                        loaders[0].reset()
+                    started = time.perf_counter()
+                    render_to_string(template, context, request)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                report[name][mode] = {
+                    'median_ms': round(statistics.median(timings), 3),
+                    'p95_ms': round(
+                        timings[max(int(len(timings) * 0.95) - 1, 0)], 3
+                    ),
+                }
+    return report
+
+
+def main():
+    args = parse_args()
+    db_path = os.path.abspath(args.db or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'templates.sqlite3'
+    ))
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ['BENCH_DB'] = db_path
+    from django_setup import django  # noqa: F401
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    reader, author = load.seed(args)
+    report = measure(page_contexts(reader, author), args.repeat)
+    for name, modes in report.items():
+        print(f'{name:14}' + ''.join(
+            f'  {mode} {result["median_ms"]:>7} мс'
+            for mode, result in modes.items()
+        ))
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
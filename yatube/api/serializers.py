@@ -0,0 +1,86 @@
+"""Сериализация объектов в JSON без сторонних библиотек.
+
+Поле ответа — функция от объекта, ``?fields=`` выбирает подмножество
+полей. Страница пишется в ответ потоком, запись за записью, без общего
+списка словарей.
+"""
+import json
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая отдаётся клиенту как JSON."""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+POST_FIELDS = {
+    'id': attrgetter('pk'),
+    'text': attrgetter('text'),
+    'pub_date': attrgetter('pub_date'),
+    'author': attrgetter('author.username'),
+    'group': lambda post: post.group and post.group.slug,
+    'image': _image_url,
+    'comments_count': attrgetter('comments_count'),
+}
+
+GROUP_FIELDS = {
+    'id': attrgetter('pk'),
+    'slug': attrgetter('slug'),
+    'title': attrgetter('title'),
+    'description': attrgetter('description'),
+}
+
+COMMENT_FIELDS = {
+    'id': attrgetter('pk'),
+    'post': attrgetter('post_id'),
+    'author': attrgetter('author.username'),
+    'text': attrgetter('text'),
+    'created': attrgetter('created'),
+}
+
+FOLLOW_FIELDS = {
+    'author': attrgetter('author.username'),
+}
+
+
+def select_fields(request, fields):
+    """Поля из ``?fields=a,b`` или все, если параметр не задан."""
+    names = request.GET.get('fields')
+    if not names:
+        return fields
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError(
+            'Неизвестные поля', unknown=unknown, available=list(fields)
+        )
+    return {name: fields[name] for name in names}
+
+
+def serialize(obj, fields):
+    return {name: getter(obj) for name, getter in fields.items()}
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def stream_page(objects, fields, links):
+    """Куски JSON ``{"results": [...], **links}`` по одной записи."""
+    yield '{"results": ['
+    for i, obj in enumerate(objects):
+        yield (', ' if i else '') + dumps(serialize(obj, fields))
+    yield ']'
+    for name, value in links.items():
+        yield f', {dumps(name)}: {dumps(value)}'
+    yield '}'
@@ -0,0 +1,257 @@
+import json
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='test_author')
+        cls.reader = User.objects.create(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}',
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, client, url, **params):
+        response = client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.status_code, json.loads(
+            b''.join(response.streaming_content)
+            if response.streaming else response.content
+        )
+
+    def send_json(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_posts_cursor_pagination(self):
+        '''Лента постов отдаётся страницами по курсору'''
+        url = reverse('api:posts')
+        with self.assertNumQueries(2):
+            status, data = self.get_json(self.guest_client, url)
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.pk for post in reversed(self.posts)][:20],
+        )
+        self.assertIsNone(data['previous'])
+        _, data = self.get_json(self.guest_client, data['next'])
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_filters_and_sparse_fields(self):
+        '''Фильтр по группе, limit и выбор полей через fields'''
+        status, data = self.get_json(
+            self.guest_client, reverse('api:posts'),
+            group=self.group.slug, fields='id,group', limit=3,
+        )
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[-2].pk, 'group': self.group.slug,
+        })
+        self.assertEqual(len(data['results']), 3)
+        self.assertIn('limit=3', data['next'])
+        status, data = self.get_json(
+            self.guest_client, reverse('api:posts'), fields='id,password'
+        )
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(data['unknown'], ['password'])
+
+    def test_post_detail(self):
+        '''Пост отдаётся целиком, несуществующий — 404 в JSON'''
+        post = self.posts[1]
+        status, data = self.get_json(self.guest_client, reverse(
+            'api:post_detail', kwargs={'post_id': post.pk}
+        ))
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['author'], self.author.username)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertIsNone(data['image'])
+        status, data = self.get_json(self.guest_client, reverse(
+            'api:post_detail', kwargs={'post_id': 0}
+        ))
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+        self.assertIn('error', data)
+
+    def test_create_edit_delete_post(self):
+        '''Пост создаёт вошедший, меняет и удаляет только автор'''
+        url = reverse('api:posts')
+        response = self.send_json(
+            self.guest_client, 'post', url, {'text': 'Новый'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.send_json(self.author_client, 'post', url, {
+            'text': 'Новый пост', 'group': self.group.slug,
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.author, self.author)
+
+        detail = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        response = self.send_json(
+            self.reader_client, 'patch', detail, {'text': 'Чужая правка'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.send_json(
+            self.author_client, 'patch', detail, {'text': 'Правка'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.group, self.group)
+
+        response = self.send_json(
+            self.author_client, 'patch', detail, {'text': ''}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+        response = self.author_client.delete(detail)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_edit_post_with_form(self):
+        '''PUT и PATCH принимают форму, чужие типы тела — 415'''
+        post = Post.objects.create(author=self.author, text='Пост')
+        detail = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        response = self.author_client.put(
+            detail, urlencode({'text': 'Из формы', 'group': self.group.slug}),
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Из формы')
+        self.assertEqual(post.group, self.group)
+
+        response = self.author_client.patch(
+            detail, encode_multipart(BOUNDARY, {'text': 'Из multipart'}),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Из multipart')
+        self.assertEqual(post.group, self.group)
+
+        response = self.author_client.patch(
+            detail, 'text=Текст', content_type='text/plain'
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Из multipart')
+
+    def test_comments(self):
+        '''Комментарии читаются страницами и добавляются вошедшими'''
+        post = self.posts[0]
+        url = reverse('api:comments', kwargs={'post_id': post.pk})
+        response = self.send_json(
+            self.reader_client, 'post', url, {'text': 'Комментарий'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], self.reader.username)
+        _, data = self.get_json(self.guest_client, url)
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            list(Comment.objects.filter(post=post).values_list(
+                'pk', flat=True
+            )),
+        )
+
+    def test_groups(self):
+        '''Группы отдаются списком и по слагу'''
+        _, data = self.get_json(self.guest_client, reverse('api:groups'))
+        self.assertEqual(data['results'][0]['slug'], self.group.slug)
+        status, data = self.get_json(self.guest_client, reverse(
+            'api:group_detail', kwargs={'slug': self.group.slug}
+        ), fields='title')
+        self.assertEqual(data, {'title': self.group.title})
+
+    def test_follows_and_feed(self):
+        '''Подписка через API наполняет ленту, отписка её очищает'''
+        url = reverse('api:follows')
+        status, _ = self.get_json(self.guest_client, url)
+        self.assertEqual(status, HTTPStatus.UNAUTHORIZED)
+        response = self.send_json(
+            self.reader_client, 'post', url, {'author': 'test_author'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response = self.send_json(
+            self.reader_client, 'post', url, {'author': 'test_reader'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        _, data = self.get_json(self.reader_client, url)
+        self.assertEqual(data['results'], [{'author': 'test_author'}])
+        _, data = self.get_json(self.reader_client, reverse('api:feed'))
+        self.assertEqual(len(data['results']), 20)
+
+        response = self.reader_client.delete(reverse(
+            'api:follow_detail', kwargs={'username': 'test_author'}
+        ))
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+
+    def test_follows_batch(self):
+        '''Пакетная подписка и отписка по списку имён'''
+        url = reverse('api:follows')
+        response = self.send_json(self.reader_client, 'post', url, {
+            'authors': ['test_author', 'test_author', 'nobody'],
+        })
+        self.assertEqual(response.json(), {'followed': 1})
+        response = self.send_json(
+            self.reader_client, 'post', url, {'author': 'test_author'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.send_json(
+            self.reader_client, 'post', url, {'authors': 'test_author'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        for author in (['test_author'], {'name': 'test_author'}, 5, '',
+                       None):
+            with self.subTest(author=author):
+                response = self.send_json(
+                    self.reader_client, 'post', url, {'author': author}
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+        response = self.send_json(self.reader_client, 'delete', url, {
+            'authors': ['test_author', 'nobody'],
+        })
+        self.assertEqual(response.json(), {'unfollowed': 1})
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+
+    def test_method_not_allowed(self):
+        '''Неподдерживаемый метод — 405 с заголовком Allow'''
+        response = self.author_client.delete(reverse('api:posts'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+        self.assertEqual(response['Allow'], 'GET, POST')
@@ -0,0 +1,317 @@
+import json
+from functools import wraps
+
+from core.paginator import CursorPaginator
+from django.http import (Http404, HttpResponse, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.utils.datastructures import MultiValueDict
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from posts import thumbnails
+from posts.feed import FeedPaginator
+from posts.follows import follow, unfollow
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+from posts.views import get_comments_page
+
+from .serializers import (COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS,
+                          POST_FIELDS, ApiError, select_fields, serialize,
+                          stream_page)
+
+PAGE_SIZE: int = 20
+MAX_PAGE_SIZE: int = 100
+MAX_FOLLOW_BATCH: int = 500
+FORM_TYPES = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+
+def api_view(*methods):
+    """Принимает только ``methods`` и отдаёт ошибки как JSON."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise ApiError('Метод не поддерживается', status=405)
+                return view(request, *args, **kwargs)
+            except Http404:
+                error = ApiError('Не найдено', status=404)
+            except ApiError as exc:
+                error = exc
+            response = JsonResponse(
+                {'error': str(error), **error.details}, status=error.status,
+                json_dumps_params={'ensure_ascii': False},
+            )
+            if error.status == 405:
+                response['Allow'] = ', '.join(methods)
+            return response
+        return wrapper
+    return decorator
+
+
+def require_user(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', status=401)
+
+
+def load_form(request):
+    """Разбирает форму в теле PUT и PATCH: Django делает это только для POST.
+
+    Данные и файлы попадают в ``request.POST`` и ``request.FILES``.
+    """
+    if request.content_type == 'multipart/form-data':
+        request._post, request._files = request.parse_file_upload(
+            request.META, request
+        )
+    else:
+        request._post = QueryDict(request.body, encoding=request.encoding)
+        request._files = MultiValueDict()
+
+
+def read_data(request):
+    """Тело запроса: объект JSON или данные формы.
+
+    Пустое тело — пустая форма, прочие типы — ошибка 415.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError('Тело запроса — не JSON')
+        if not isinstance(data, dict):
+            raise ApiError('Тело запроса должно быть объектом JSON')
+        return data
+    if request.content_type not in FORM_TYPES:
+        if request.body:
+            raise ApiError(
+                'Тело запроса должно быть JSON или формой', status=415
+            )
+        return QueryDict(encoding=request.encoding)
+    if request.method != 'POST':
+        load_form(request)
+    return request.POST
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def object_response(obj, fields, status=200):
+    return JsonResponse(
+        serialize(obj, fields), status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def page_response(request, page, fields):
+    """Страница курсорной пагинации потоком JSON."""
+    links = {}
+    for name, cursor in (('next', page.next_cursor),
+                         ('previous', page.previous_cursor)):
+        links[name] = None
+        if cursor:
+            query = request.GET.copy()
+            query['cursor'] = cursor
+            links[name] = request.build_absolute_uri(
+                f'{request.path}?{query.urlencode()}'
+            )
+    return StreamingHttpResponse(
+        stream_page(page, fields, links), content_type='application/json'
+    )
+
+
+def paginate(request, queryset, fields, **kwargs):
+    fields = select_fields(request, fields)
+    paginator = CursorPaginator(queryset, get_limit(request), **kwargs)
+    return page_response(
+        request, paginator.get_page(request.GET.get('cursor')), fields
+    )
+
+
+def form_data(form, data):
+    """Данные для формы: поля, которых нет в ``data``, берутся из объекта."""
+    merged = {
+        name: form.initial.get(name) for name in form.fields
+        if form.initial.get(name) is not None
+    }
+    merged.update(data.items())
+    return merged
+
+
+def resolve_group(data):
+    """Заменяет слаг группы из запроса на её id, как ждёт PostForm."""
+    slug = data.get('group')
+    if not slug:
+        return data
+    data = dict(data.items())
+    group = Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    if not group:
+        raise ApiError('Группа не найдена', group=[slug])
+    data['group'] = group[0]
+    return data
+
+
+def save_post(request, form):
+    if not form.is_valid():
+        raise ApiError('Ошибка в данных', errors=form.errors.get_json_data())
+    image_changed = 'image' in form.changed_data
+    post = form.save(commit=False)
+    if post.author_id is None:
+        post.author = request.user
+    post.save()
+    if image_changed:
+        thumbnails.schedule(post)
+    return post
+
+
+@api_view('GET', 'POST')
+def posts(request):
+    if request.method == 'POST':
+        require_user(request)
+        form = PostForm(resolve_group(read_data(request)),
+                        files=request.FILES or None)
+        post = save_post(request, form)
+        return object_response(post, POST_FIELDS, status=201)
+    post_list = Post.objects.for_feed()
+    if request.GET.get('group'):
+        post_list = post_list.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        post_list = post_list.filter(
+            author__username=request.GET['author']
+        )
+    return paginate(request, post_list, POST_FIELDS)
+
+
+@api_view('GET', 'PUT', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    if request.method == 'GET':
+        return object_response(post, select_fields(request, POST_FIELDS))
+    require_user(request)
+    if post.author_id != request.user.pk:
+        raise ApiError('Менять пост может только автор', status=403)
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=204)
+    data = resolve_group(read_data(request))
+    form = PostForm(instance=post)
+    if request.method == 'PATCH':
+        data = form_data(form, data)
+    form = PostForm(data, instance=post, files=request.FILES or None)
+    return object_response(save_post(request, form), POST_FIELDS)
+
+
+@api_view('GET', 'POST')
+def comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    if request.method == 'POST':
+        require_user(request)
+        form = CommentForm(read_data(request))
+        if not form.is_valid():
+            raise ApiError(
+                'Ошибка в данных', errors=form.errors.get_json_data()
+            )
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        return object_response(comment, COMMENT_FIELDS, status=201)
+    fields = select_fields(request, COMMENT_FIELDS)
+    page = get_comments_page(request, post.pk, get_limit(request))
+    return page_response(request, page, fields)
+
+
+@api_view('GET')
+def groups(request):
+    return paginate(
+        request, Group.objects.all(), GROUP_FIELDS, ordering=('pk',)
+    )
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return object_response(group, select_fields(request, GROUP_FIELDS))
+
+
+@api_view('GET')
+def feed(request):
+    require_user(request)
+    fields = select_fields(request, POST_FIELDS)
+    paginator = FeedPaginator(request.user, get_limit(request))
+    return page_response(
+        request, paginator.get_page(request.GET.get('cursor')), fields
+    )
+
+
+def read_authors(data):
+    """Имена авторов пакетной подписки или отписки."""
+    if hasattr(data, 'getlist'):
+        authors = data.getlist('authors')
+    else:
+        authors = data.get('authors')
+    if (not isinstance(authors, list)
+            or not all(isinstance(name, str) for name in authors)):
+        raise ApiError('authors должен быть списком имён')
+    if len(authors) > MAX_FOLLOW_BATCH:
+        raise ApiError(f'Не больше {MAX_FOLLOW_BATCH} авторов за запрос')
+    return authors
+
+
+def follow_author(request, username):
+    if not isinstance(username, str) or not username:
+        raise ApiError('author должен быть именем пользователя')
+    created = follow(request.user, [username])
+    if created:
+        instance = created[0]
+        instance.author = User(pk=instance.author_id, username=username)
+        return object_response(instance, FOLLOW_FIELDS, status=201)
+    instance = Follow.objects.filter(
+        user=request.user, author__username=username
+    ).select_related('author').first()
+    if instance is not None:
+        return object_response(instance, FOLLOW_FIELDS)
+    if not User.objects.filter(username=username).exists():
+        raise ApiError('Автор не найден', author=[username])
+    raise ApiError('Нельзя подписаться на себя')
+
+
+@api_view('GET', 'POST', 'DELETE')
+def follows(request):
+    """Подписки; ``authors`` в POST и DELETE — пакетом, одним запросом."""
+    require_user(request)
+    if request.method == 'GET':
+        follow_list = Follow.objects.filter(
+            user=request.user
+        ).select_related('author').only('author', 'author__username')
+        return paginate(
+            request, follow_list, FOLLOW_FIELDS, ordering=('-pk',)
+        )
+    data = read_data(request)
+    if request.method == 'POST' and 'authors' not in data:
+        return follow_author(request, data.get('author'))
+    authors = read_authors(data)
+    if request.method == 'POST':
+        result = {'followed': len(follow(request.user, authors))}
+    else:
+        result = {'unfollowed': len(unfollow(request.user, authors))}
+    return JsonResponse(result)
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    require_user(request)
+    unfollow(request.user, [username])
+    return HttpResponse(status=204)
+
+
+@api_view('GET')
+def index(request):
+    """Корень API: адреса коллекций."""
+    return JsonResponse({
+        name: request.build_absolute_uri(reverse(f'api:{name}'))
+        for name in ('posts', 'groups', 'feed', 'follows')
+    })
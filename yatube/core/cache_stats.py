@@ -0,0 +1,68 @@
+"""Сигнал о чтениях из кэшей: для профилирования и метрик.
+
+``install()`` один раз оборачивает ``get`` и ``get_many`` бэкендов из
+``settings.CACHES``; после этого каждое внешнее чтение шлёт
+``cache_read`` с псевдонимом кэша, числом попаданий и промахов.
+Чтения ``get`` внутри ``get_many`` отдельно не считаются.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.dispatch import Signal
+
+cache_read = Signal(providing_args=['alias', 'hits', 'misses'])
+
+_local = threading.local()
+_MISSING = object()
+
+
+def _alias(cache):
+    """Псевдоним кэша: экземпляры в ``caches`` свои у каждого потока."""
+    for alias in settings.CACHES:
+        if caches[alias] is cache:
+            return alias
+    return type(cache).__name__
+
+
+def _send(cache, hits, misses):
+    if cache_read.receivers:
+        cache_read.send(
+            sender=type(cache), alias=_alias(cache), hits=hits, misses=misses
+        )
+
+
+def _get(method):
+    def get(self, key, default=None, version=None):
+        value = method(self, key, _MISSING, version=version)
+        missed = value is _MISSING
+        if not getattr(_local, 'depth', 0):
+            _send(self, int(not missed), int(missed))
+        return default if missed else value
+    get.instrumented = True
+    return get
+
+
+def _get_many(method):
+    def get_many(self, keys, version=None):
+        _local.depth = getattr(_local, 'depth', 0) + 1
+        try:
+            found = method(self, keys, version=version)
+        finally:
+            _local.depth -= 1
+        if not _local.depth:
+            _send(self, len(found), len(keys) - len(found))
+        return found
+    get_many.instrumented = True
+    return get_many
+
+
+def install():
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if getattr(backend.get, 'instrumented', False):
+            continue
+        backend.get = _get(backend.get)
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = _get_many(backend.get_many)
@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class FullTextField(models.TextField):
+    """Колонка полнотекстового индекса SQLite FTS5.
+
+    Лукап ``match`` ищет по всей таблице FTS5:
+    ``filter(text__match='"слово"')``; ограничить колонки можно фильтром
+    в самом выражении (``'text : "слово"'``).
+    """
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        table = compiler.quote_name_unless_alias(self.lhs.alias)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{table} MATCH {rhs}', rhs_params
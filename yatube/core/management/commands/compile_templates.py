@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import template_warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны проекта и проверяет, что их extends '
+        'и include находятся'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count, errors = template_warmup.compile_all()
+        elapsed = time.perf_counter() - started
+        for name, message in errors:
+            self.stderr.write(f'{name}: {message}')
+        if errors:
+            raise CommandError(f'Ошибок в шаблонах: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Шаблонов: {count}, разобраны за {elapsed * 1000:.0f} мс'
+        ))
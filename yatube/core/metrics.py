@@ -0,0 +1,334 @@
+"""Метрики в текстовом формате Prometheus.
+
+Каждый процесс пишет свои счётчики в собственный файл
+``METRICS_DIR/metrics-<pid>.db``, отображённый в память (``mmap``):
+запись — пара ``struct.pack_into`` под блокировкой процесса, без
+системных вызовов. ``/metrics`` читает файлы всех процессов и
+складывает значения, поэтому воркеры gunicorn и uWSGI видны вместе.
+Файлы завершившихся процессов остаются и продолжают входить в сумму:
+счётчики не откатываются после перезапуска воркера. Каталог стоит
+очищать при деплое, до запуска воркеров.
+
+Формат файла: 8 байт — сколько занято, затем записи «длина ключа (4
+байта), ключ JSON, выровненный до 8 байт, значение double».
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import cache_stats
+
+INITIAL_SIZE = 1 << 16
+HEADER = struct.Struct('q')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+THUMBNAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class FileStore:
+    """Значения одного процесса в файле, отображённом в память."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._map, 0)[0]
+        if not self._used:
+            self._used = HEADER.size
+            HEADER.pack_into(self._map, 0, self._used)
+        self._positions = {
+            key: position
+            for key, _, position in _entries(self._map, self._used)
+        }
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._add(key)
+            value = VALUE.unpack_from(self._map, position)[0]
+            VALUE.pack_into(self._map, position, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode()
+        padding = -(LENGTH.size + len(encoded)) % 8
+        entry = (LENGTH.pack(len(encoded)) + encoded + b' ' * padding
+                 + VALUE.pack(0.0))
+        while self._used + len(entry) > len(self._map):
+            size = len(self._map) * 2
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+        start = self._used
+        self._map[start:start + len(entry)] = entry
+        self._used += len(entry)
+        # Длину пишем последней: читатель не увидит запись наполовину
+        HEADER.pack_into(self._map, 0, self._used)
+        position = self._used - VALUE.size
+        self._positions[key] = position
+        return position
+
+
+def _entries(data, used):
+    """(ключ, значение, смещение значения) записей файла."""
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        position += LENGTH.size
+        key = bytes(data[position:position + length]).decode()
+        position += length + (-(LENGTH.size + length) % 8)
+        yield key, VALUE.unpack_from(data, position)[0], position
+        position += VALUE.size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Файл текущего процесса; после fork у потомка — свой."""
+    global _store
+    path = os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.db')
+    store = _store
+    if store is None or store.path != path:
+        with _store_lock:
+            if _store is None or _store.path != path:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                _store = FileStore(path)
+            store = _store
+    return store
+
+
+def collect():
+    """Значения всех процессов, сложенные по ключам."""
+    totals = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.db')):
+        try:
+            with open(path, 'rb') as source:
+                data = source.read()
+        except FileNotFoundError:
+            continue
+        if len(data) < HEADER.size:
+            continue
+        for key, value, _ in _entries(data, HEADER.unpack_from(data, 0)[0]):
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+class Metric:
+    kind = None
+    registry = []
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        Metric.registry.append(self)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: нужны метки {self.labelnames}')
+        return {name: str(value) for name, value in labels.items()}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        get_store().inc(_key(self.name, self._labels(labels)), amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        # В файле — число наблюдений в каждой корзине, накопительные
+        # суммы для le считаются при выдаче
+        index = bisect_left(self.buckets, value)
+        bound = self.buckets[index] if index < len(self.buckets) else '+Inf'
+        store = get_store()
+        store.inc(_key(f'{self.name}_bucket', {**labels, 'le': bound}))
+        store.inc(_key(f'{self.name}_sum', labels), value)
+        store.inc(_key(f'{self.name}_count', labels))
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total', 'Ответы по вьюхам, методам и кодам',
+    ('view', 'method', 'status'),
+)
+REQUEST_SECONDS = Histogram(
+    'yatube_http_request_duration_seconds', 'Время ответа вьюхи',
+    ('view',),
+)
+DB_QUERIES = Counter(
+    'yatube_db_queries_total', 'SQL-запросы по вьюхам', ('view',),
+)
+DB_SECONDS = Counter(
+    'yatube_db_query_seconds_total', 'Время SQL-запросов по вьюхам',
+    ('view',),
+)
+CACHE_READS = Counter(
+    'yatube_cache_reads_total', 'Чтения из кэшей: hit или miss',
+    ('cache', 'result'),
+)
+THUMBNAIL_SECONDS = Histogram(
+    'yatube_thumbnail_duration_seconds',
+    'Подготовка уменьшенных копий одной картинки', ('result',),
+    buckets=THUMBNAIL_BUCKETS,
+)
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _bucket_lines(metric, samples):
+    """Накопительные ``_bucket`` по каждому набору меток."""
+    series = {}
+    for labels, value in samples:
+        labels = dict(labels)
+        le = labels.pop('le')
+        bound = float('inf') if le == '+Inf' else float(le)
+        series.setdefault(tuple(sorted(labels.items())), {})[bound] = value
+    for labels, counts in sorted(series.items()):
+        total = 0.0
+        for bound in (*metric.buckets, float('inf')):
+            total += counts.get(bound, 0.0)
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            yield (f'{metric.name}_bucket'
+                   f'{_format_labels(labels + (("le", le),))} '
+                   f'{_format_value(total)}')
+
+
+def _hit_ratio_lines(totals):
+    reads = {}
+    for labels, value in totals.get(CACHE_READS.name, ()):
+        labels = dict(labels)
+        reads.setdefault(labels['cache'], {})[labels['result']] = value
+    if not reads:
+        return
+    yield '# HELP yatube_cache_hit_ratio Доля попаданий в кэш с запуска'
+    yield '# TYPE yatube_cache_hit_ratio gauge'
+    for alias, counts in sorted(reads.items()):
+        hits, misses = counts.get('hit', 0.0), counts.get('miss', 0.0)
+        yield (f'yatube_cache_hit_ratio{_format_labels([("cache", alias)])} '
+               f'{hits / (hits + misses) if hits + misses else 0.0!r}')
+
+
+def render():
+    """Текст для Prometheus по всем процессам."""
+    samples = {}
+    for key, value in collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((tuple(map(tuple, labels)),
+                                             value))
+    lines = []
+    for metric in Metric.registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if metric.kind == 'histogram':
+            lines.extend(_bucket_lines(
+                metric, samples.get(f'{metric.name}_bucket', ())
+            ))
+            names = (f'{metric.name}_sum', f'{metric.name}_count')
+        else:
+            names = (metric.name,)
+        for name in names:
+            for labels, value in sorted(samples.get(name, ())):
+                lines.append(f'{name}{_format_labels(labels)} '
+                             f'{_format_value(value)}')
+    lines.extend(_hit_ratio_lines(samples))
+    return '\n'.join(lines) + '\n'
+
+
+def _count_cache_read(sender, alias, hits, misses, **kwargs):
+    if hits:
+        CACHE_READS.inc(hits, cache=alias, result='hit')
+    if misses:
+        CACHE_READS.inc(misses, cache=alias, result='miss')
+
+
+class QueryCounter:
+    """Обёртка ``execute_wrapper``: число и время запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Считает время, коды ответов и SQL-запросы каждой вьюхи.
+
+    Ставится первой в ``MIDDLEWARE``, чтобы видеть и ответы из кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        cache_stats.install()
+        cache_stats.cache_read.connect(
+            _count_cache_read, dispatch_uid='metrics'
+        )
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        # Метки — из конечного набора, иначе рядов станет сколько угодно
+        method = request.method if request.method in METHODS else 'other'
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, view=view)
+        if queries.count:
+            DB_QUERIES.inc(queries.count, view=view)
+            DB_SECONDS.inc(queries.seconds, view=view)
+        return response
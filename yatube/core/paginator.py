@@ -0,0 +1,297 @@
+import base64
+import binascii
+import hashlib
+import json
+import math
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Ссылка окна страниц; у пропуска «…» номера нет, у первой — курсора
+PageLink = namedtuple('PageLink', 'number cursor current')
+ELLIPSIS = PageLink(None, None, False)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по полям ``ordering`` (по умолчанию pub_date, id).
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` каждая страница выбирается условием
+    «строго после/до ключа» последней показанной записи, поэтому глубокие
+    страницы открываются так же быстро, как первая. Положение в ленте
+    передаётся непрозрачным токеном ``?cursor=``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 count_timeout=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.count_timeout = count_timeout
+        self._num_pages = 1
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @property
+    def num_pages(self):
+        """Число страниц, о которых известно после выборки текущей."""
+        return self._num_pages
+
+    @property
+    def approximate_count(self):
+        """Общее число записей, закэшированное на ``count_timeout`` секунд.
+
+        Значение может немного отставать от базы; если ``count_timeout``
+        не задан, подсчёт не выполняется вовсе.
+        """
+        if self.count_timeout is None:
+            return None
+        sql = str(self.object_list.query).encode()
+        key = 'paginator_count:' + hashlib.md5(sql).hexdigest()
+        # Аннотации (например, ранг поиска) для подсчёта не нужны
+        counted = self.object_list.values('pk')
+        return cache.get_or_set(key, counted.count, self.count_timeout)
+
+    def _encode(self, values, direction, number):
+        raw = json.dumps([values, direction, number])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def encode_cursor(self, obj, direction, number):
+        values = [self._dump_value(obj, name) for name in self.ordering]
+        return self._encode(values, direction, number)
+
+    def end_cursor(self, number):
+        """Курсор последней страницы: её записи читаются с конца ленты."""
+        return self._encode(None, PREVIOUS, number)
+
+    def _tail_size(self, number):
+        """Сколько записей на последней странице с номером ``number``.
+
+        Как при переходах «Следующая» с первой страницы: остаток от
+        :attr:`approximate_count`, иначе соседние страницы сдвинутся.
+        """
+        count = self.approximate_count
+        if not count:
+            return self.per_page
+        size = count - (number - 1) * self.per_page
+        return min(max(size, 1), self.per_page)
+
+    def decode_cursor(self, cursor):
+        """Возвращает (значения ключа, направление, номер страницы).
+
+        Для пустого или испорченного токена возвращает None.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values, direction, number = json.loads(raw.decode())
+            if values is not None:
+                values = [
+                    self._get_field(name).to_python(value)
+                    for name, value in zip(self.ordering, values)
+                ]
+        except (binascii.Error, ValueError, TypeError, AttributeError,
+                UnicodeDecodeError, ValidationError, OverflowError):
+            return None
+        if (direction not in (NEXT, PREVIOUS)
+                or not isinstance(number, int)):
+            return None
+        # Без ключа бывает только курсор последней страницы
+        if values is None and direction != PREVIOUS:
+            return None
+        if values is not None and len(values) != len(self.ordering):
+            return None
+        # Числа вне BIGINT база не примет: OverflowError при запросе
+        if values is not None and any(
+            isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63
+            for value in values
+        ):
+            return None
+        return values, direction, max(number, 1)
+
+    def _get_field(self, name):
+        """Поле модели или выходное поле аннотации (например, ранга)."""
+        opts = self.object_list.model._meta
+        name = name.lstrip('-')
+        if name == 'pk':
+            return opts.pk
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return opts.get_field(name)
+
+    def _dump_value(self, obj, name):
+        name = name.lstrip('-')
+        if name in self.object_list.query.annotations:
+            return getattr(obj, name)
+        return self._get_field(name).value_to_string(obj)
+
+    def _keyset_filter(self, values, direction):
+        """Условие «запись идёт после ключа» в порядке ``direction``.
+
+        Кроме точного условия по всем полям добавляется нестрогая граница
+        по первому полю: по ней планировщик выбирает диапазонный проход
+        по индексу вместо объединения нескольких OR-веток.
+        """
+        condition = Q()
+        bound = None
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            if direction == PREVIOUS:
+                descending = not descending
+            field = name.lstrip('-')
+            lookup = '{}__{}'.format(field, 'lt' if descending else 'gt')
+            equal = {
+                prev.lstrip('-'): value
+                for prev, value in zip(self.ordering[:i], values)
+            }
+            condition |= Q(**equal, **{lookup: values[i]})
+            if bound is None:
+                bound = Q(**{lookup + 'e': values[i]})
+        return bound & condition
+
+    def window(self, values, direction):
+        """Записи после ключа ``values`` в порядке обхода ``direction``.
+
+        При ``values`` равном None выборка начинается с начала ленты.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, direction))
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        return queryset
+
+    def fetch(self, values, direction, limit):
+        """Первые ``limit`` записей окна :meth:`window`."""
+        return list(self.window(values, direction)[:limit])
+
+    def fetch_keys(self, values, direction, limit):
+        """Как :meth:`fetch`, но из записей читаются только поля ключа."""
+        names = [name.lstrip('-') for name in self.ordering]
+        annotations = self.object_list.query.annotations
+        model = self.object_list.model
+        keys = []
+        rows = self.window(values, direction).values_list(*names)[:limit]
+        for row in rows:
+            # Модель без связей: у related-менеджера qs иначе дочитал бы
+            # отложенный внешний ключ каждой записи
+            obj = model(**{
+                name: value for name, value in zip(names, row)
+                if name not in annotations
+            })
+            for name, value in zip(names, row):
+                if name in annotations:
+                    setattr(obj, name, value)
+            keys.append(obj)
+        return keys
+
+    def page(self, cursor=None):
+        """Возвращает страницу, следующую за ключом из ``cursor``."""
+        decoded = self.decode_cursor(cursor)
+        values, direction, number = decoded or (None, NEXT, 1)
+        size = self.per_page
+        if values is None and direction == PREVIOUS:
+            size = self._tail_size(number)
+        rows = self.fetch(values, direction, size + 1)
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if decoded is not None and not rows:
+            # Записей за ключом уже нет (их удалили): вместо пустой
+            # страницы — конец ленты или её начало
+            if direction == NEXT:
+                return self.page(self.end_cursor(max(number - 1, 1)))
+            if values is not None:
+                return self.page(None)
+
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_previous, has_next = has_more, values is not None
+        else:
+            has_previous, has_next = decoded is not None, has_more
+        # Номер из курсора — лишь подсказка: первой считается страница,
+        # перед которой записей нет
+        number = max(number, 2) if has_previous else 1
+
+        self._num_pages = number + 1 if has_next and rows else number
+        page = Page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and page.has_next():
+            page.next_cursor = self.encode_cursor(rows[-1], NEXT, number + 1)
+        if rows and page.has_previous():
+            page.previous_cursor = self.encode_cursor(
+                rows[0], PREVIOUS, number - 1
+            )
+        return page
+
+    def get_page(self, cursor):
+        return self.page(cursor)
+
+    def _neighbours(self, cursor, on_each_side):
+        """Курсоры ``on_each_side`` страниц в сторону ``cursor``.
+
+        Ключи записей за соседней страницей читаются одним запросом;
+        возвращает курсоры и признак того, что записи есть и дальше.
+        """
+        values, direction, number = self.decode_cursor(cursor)
+        step = 1 if direction == NEXT else -1
+        rows = self.fetch_keys(
+            values, direction, on_each_side * self.per_page + 1
+        )
+        cursors = [cursor]
+        for k in range(1, on_each_side):
+            if len(rows) <= k * self.per_page:
+                break
+            cursors.append(self.encode_cursor(
+                rows[k * self.per_page - 1], direction, number + k * step
+            ))
+        return cursors, len(rows) > len(cursors) * self.per_page
+
+    def get_page_window(self, page, on_each_side=2):
+        """Ссылки на первую, последнюю и ±``on_each_side`` страниц.
+
+        Курсоры соседних страниц строятся по ключам следующих записей,
+        так что в окне нет страниц, которых на самом деле нет. Номер
+        последней известен только из :attr:`approximate_count`; без него
+        вместо ссылки на неё — пропуск.
+        """
+        number = page.number
+        before, more_before = [], False
+        if page.previous_cursor:
+            before, more_before = self._neighbours(
+                page.previous_cursor, on_each_side
+            )
+            # Первая страница — без курсора, как её и открывают
+            before = [
+                (number - k, '' if number - k == 1 else cursor)
+                for k, cursor in enumerate(before, 1) if number - k >= 1
+            ][::-1]
+        after, more_after = [], False
+        if page.next_cursor:
+            after, more_after = self._neighbours(
+                page.next_cursor, on_each_side
+            )
+            after = [(number + k, cursor) for k, cursor in enumerate(after, 1)]
+        links = [PageLink(n, cursor, False) for n, cursor in before]
+        if more_before and before[0][0] > 1:
+            links[:0] = [PageLink(1, '', False)] + (
+                [ELLIPSIS] if before[0][0] > 2 else []
+            )
+        links.append(PageLink(number, None, True))
+        links.extend(PageLink(n, cursor, False) for n, cursor in after)
+        if more_after:
+            last = links[-1].number
+            count = self.approximate_count
+            total = math.ceil(count / self.per_page) if count else None
+            if total is None or total <= last:
+                links.append(ELLIPSIS)
+            else:
+                if total > last + 1:
+                    links.append(ELLIPSIS)
+                links.append(PageLink(total, self.end_cursor(total), False))
+        return links
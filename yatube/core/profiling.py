@@ -0,0 +1,195 @@
+"""Профилирование запросов: SQL, шаблоны и кэш.
+
+Включается ``PROFILING_ENABLED``: тогда ``ProfilingMiddleware`` ставится
+сразу за метриками и на время запроса записывает SQL-запросы всех
+баз (с повторами), время рендера каждого шаблона и попадания в кэши.
+Итог уходит в заголовок ``Server-Timing`` и в кольцевой буфер последних
+``PROFILING_HISTORY`` запросов процесса — его показывает персоналу
+страница ``core:profiling``.
+
+Время шаблона включает вложенные: у ``base.html`` в него входят
+``includes/*.html``, у страницы — ``base.html``. В ``Server-Timing``
+идёт время только внешних шаблонов.
+"""
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache_stats
+
+history = deque(maxlen=settings.PROFILING_HISTORY)
+_ids = itertools.count(1)
+_local = threading.local()
+
+
+def current():
+    """Профиль текущего запроса или None."""
+    return getattr(_local, 'profile', None)
+
+
+class Profile:
+    """Что делал один запрос."""
+
+    def __init__(self, request):
+        self.id = next(_ids)
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.started = timezone.now()
+        self.status = None
+        self.duration = 0.0
+        self.queries = []
+        self.templates = {}
+        self.template_time = 0.0
+        self.cache = {}
+        self._template_depth = 0
+        self._start = time.perf_counter()
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper``: засекает запрос."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, repr(params), time.perf_counter() - started)
+            )
+
+    def add_template(self, name, seconds, top):
+        count, total = self.templates.get(name, (0, 0.0))
+        self.templates[name] = (count + 1, total + seconds)
+        if top:
+            self.template_time += seconds
+
+    def add_cache(self, alias, hits, misses):
+        old_hits, old_misses = self.cache.get(alias, (0, 0))
+        self.cache[alias] = (old_hits + hits, old_misses + misses)
+
+    def finish(self, response):
+        self.status = response.status_code
+        self.duration = time.perf_counter() - self._start
+
+    @property
+    def sql_time(self):
+        return sum(seconds for *_, seconds in self.queries)
+
+    @property
+    def duplicates(self):
+        """Запросы, повторённые с теми же параметрами: (число, SQL)."""
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return sorted(
+            ((count, sql) for (sql, _), count in counts.items()
+             if count > 1),
+            reverse=True,
+        )
+
+    @property
+    def similar(self):
+        """Один SQL с разными параметрами — признак N+1: (число, SQL)."""
+        counts = Counter(sql for sql, *_ in self.queries)
+        return sorted(
+            ((count, sql) for sql, count in counts.items() if count > 1),
+            reverse=True,
+        )
+
+    @property
+    def cache_hits(self):
+        return sum(hits for hits, _ in self.cache.values())
+
+    @property
+    def cache_misses(self):
+        return sum(misses for _, misses in self.cache.values())
+
+    def template_rows(self):
+        """(шаблон, рендеров, мс) от самого долгого."""
+        return sorted(
+            ((name, count, seconds * 1000)
+             for name, (count, seconds) in self.templates.items()),
+            key=lambda row: -row[2],
+        )
+
+    def query_rows(self):
+        """(мс, SQL) от самого долгого."""
+        return sorted(
+            ((seconds * 1000, sql) for sql, _, seconds in self.queries),
+            reverse=True,
+        )
+
+    def server_timing(self):
+        duplicates = sum(count - 1 for count, _ in self.duplicates)
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{len(self.queries)} queries, {duplicates} duplicate"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ))
+
+
+def _patch_templates():
+    render = Template._render
+    if getattr(render, 'profiled', False):
+        return
+
+    def _render(self, context):
+        profile = current()
+        if profile is None:
+            return render(self, context)
+        profile._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile._template_depth -= 1
+            profile.add_template(
+                self.name or '<string>', time.perf_counter() - started,
+                top=profile._template_depth == 0,
+            )
+
+    _render.profiled = True
+    Template._render = _render
+
+
+def _record_cache(sender, alias, hits, misses, **kwargs):
+    profile = current()
+    if profile is not None:
+        profile.add_cache(alias, hits, misses)
+
+
+class ProfilingMiddleware:
+    """Записывает профиль каждого запроса, кроме страницы профилей."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _patch_templates()
+        cache_stats.install()
+        cache_stats.cache_read.connect(
+            _record_cache, dispatch_uid='profiling'
+        )
+
+    def __call__(self, request):
+        if request.path == reverse('core:profiling'):
+            return self.get_response(request)
+        profile = Profile(request)
+        _local.profile = profile
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        profile.finish(response)
+        response['Server-Timing'] = profile.server_timing()
+        history.append(profile)
+        return response
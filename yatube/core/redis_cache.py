@@ -0,0 +1,295 @@
+"""Общий для всех процессов кэш по протоколу Redis (RESP).
+
+Подключается через ``settings.CACHES``::
+
+    'default': {
+        'BACKEND': 'core.redis_cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/0',
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {'MAX_CONNECTIONS': 20, 'SOCKET_TIMEOUT': 1},
+    }
+
+В отличие от ``LocMemCache`` все воркеры видят одни и те же ключи, поэтому
+инвалидация лент и миниатюр доходит до каждого из них. Префиксы и версии
+ключей — штатные ``KEY_PREFIX``/``VERSION`` из ``BaseCache``.
+"""
+import pickle
+import queue
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# INCRBY создаёт отсутствующий ключ, а incr() должен падать: проверка
+# и увеличение идут одним скриптом, чтобы ключ не пропал между ними
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return false"
+)
+
+
+# Сколько ключей просматривать за один SCAN при очистке
+CLEAR_BATCH = 1000
+
+
+def _glob_escape(text):
+    return ''.join(f'\\{char}' if char in '\\*?[]' else char
+                   for char in text)
+
+
+class RespError(Exception):
+    """Сервер ответил ошибкой."""
+
+
+def encode_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(reader):
+    """Читает один ответ RESP из файлового объекта ``reader``."""
+    line = reader.readline()
+    if not line:
+        raise ConnectionError('Соединение с кэшем закрыто')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        return RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise RespError(f'Неизвестный тип ответа: {line!r}')
+
+
+class Connection:
+    def __init__(self, host, port, db, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if db:
+            self.execute([('SELECT', db)])
+
+    def execute(self, commands):
+        """Отправляет команды одним пакетом и возвращает ответы."""
+        self.sock.sendall(b''.join(encode_command(*c) for c in commands))
+        return [read_reply(self.reader) for _ in commands]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с ограничением их числа."""
+
+    def __init__(self, location, max_connections=20, timeout=None):
+        url = urlparse(location)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 6379
+        self.db = int(url.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.created = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+
+    def execute(self, *commands):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Connection(self.host, self.port, self.db, self.timeout)
+                with self._lock:
+                    self.created += 1
+            try:
+                replies = conn.execute(commands)
+            except BaseException:
+                # Ответ мог быть прочитан не до конца: такое соединение
+                # в пул не возвращается
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def disconnect(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RedisCache(BaseCache):
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        key = (location, options.get('SOCKET_TIMEOUT'))
+        with self._pools_lock:
+            # Один пул на процесс для каждого адреса: экземпляры бэкенда
+            # создаются заново в каждом потоке
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(
+                    location,
+                    max_connections=options.get('MAX_CONNECTIONS', 20),
+                    timeout=options.get('SOCKET_TIMEOUT'),
+                )
+        self.pool = self._pools[key]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        # Целые числа храним как есть, чтобы работал INCRBY
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(data):
+        if data is None:
+            return None
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _ttl_ms(self, timeout):
+        """Относительный TTL в миллисекундах или None для вечных ключей."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout * 1000), 1)
+
+    def _set_command(self, key, value, timeout, only_new=False):
+        command = ['SET', key, self._dump(value)]
+        ttl = self._ttl_ms(timeout)
+        if ttl is not None:
+            command += ['PX', ttl]
+        if only_new:
+            command.append('NX')
+        return command
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == 0:
+            return False
+        reply, = self.pool.execute(
+            self._set_command(key, value, timeout, only_new=True)
+        )
+        return reply is not None
+
+    def get(self, key, default=None, version=None):
+        data, = self.pool.execute(('GET', self._key(key, version)))
+        return default if data is None else self._load(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == 0:
+            self.pool.execute(('DEL', key))
+            return
+        self.pool.execute(self._set_command(key, value, timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl_ms(timeout)
+        if ttl is None:
+            _, reply = self.pool.execute(('PERSIST', key), ('EXISTS', key))
+        else:
+            reply, = self.pool.execute(('PEXPIRE', key, ttl))
+        return bool(reply)
+
+    def delete(self, key, version=None):
+        self.pool.execute(('DEL', self._key(key, version)))
+
+    def has_key(self, key, version=None):
+        reply, = self.pool.execute(('EXISTS', self._key(key, version)))
+        return bool(reply)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        reply, = self.pool.execute(('EVAL', INCR_SCRIPT, 1, key, delta))
+        if reply is None:
+            raise ValueError(f"Key '{key}' not found")
+        return reply
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = [self._key(key, version) for key in keys]
+        values, = self.pool.execute(('MGET', *made))
+        return {
+            key: self._load(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        if timeout == 0:
+            self.delete_many(data, version=version)
+            return []
+        self.pool.execute(*(
+            self._set_command(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self.pool.execute(('DEL', *keys))
+
+    def clear(self):
+        """Удаляет ключи только этого кэша — по его ``KEY_PREFIX``.
+
+        Все алиасы живут в одной базе Redis, и ``FLUSHDB`` стёр бы чужие
+        ключи. Шаблон рассчитан на штатную ``KEY_FUNCTION``:
+        ``<префикс>:<версия>:<ключ>``.
+        """
+        pattern = _glob_escape(self.key_prefix) + ':*'
+        cursor = b'0'
+        while True:
+            (cursor, keys), = self.pool.execute(
+                ('SCAN', cursor, 'MATCH', pattern, 'COUNT', CLEAR_BATCH)
+            )
+            if keys:
+                self.pool.execute(('DEL', *keys))
+            if cursor == b'0':
+                return
+
+    def close(self, **kwargs):
+        # Соединения живут в пуле процесса и переиспользуются между
+        # запросами, закрывать их после каждого ответа не нужно
+        pass
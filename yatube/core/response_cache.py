@@ -0,0 +1,143 @@
+"""Кэш целых ответов для анонимных читателей.
+
+Страницы, помеченные ``@cache_anonymous``, отдаются анонимам из кэша
+``settings.RESPONSE_CACHE_ALIAS`` по ключу из пути и строки запроса.
+У каждого пути своя версия: ``invalidate(path)`` сбрасывает все его
+страницы (``?cursor=...``) сразу, не трогая остальные.
+
+Промах рендерит только один запрос — тот, что взял блокировку; прочие
+ждут, пока ответ появится в кэше, и рендерят сами, лишь если он вышел
+некэшируемым или ждать пришлось дольше ``RESPONSE_CACHE_LOCK_TIMEOUT``.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+RESPONSE_KEY = 'response:{}:{}'
+VERSION_KEY = 'response_version:{}'
+LOCK_KEY = 'response_lock:{}'
+POLL_INTERVAL = 0.05
+
+
+def cache_anonymous(view):
+    """Разрешает кэшировать ответы ``view`` анонимам целиком."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.cache_anonymous = True
+    return wrapper
+
+
+def get_cache():
+    try:
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def get_version(path):
+    key = VERSION_KEY.format(_digest(path))
+    response_cache = get_cache()
+    version = response_cache.get(key)
+    if version is None:
+        # Как и у версий лент: после вытеснения счётчика не совпасть
+        # с ещё живыми ответами старых версий
+        response_cache.add(key, int(time.time() * 1000), None)
+        version = response_cache.get(key)
+    return version
+
+
+def invalidate(*paths):
+    """Сбрасывает закэшированные ответы ``paths`` со всеми параметрами."""
+    response_cache = get_cache()
+    for path in set(paths):
+        key = VERSION_KEY.format(_digest(path))
+        try:
+            response_cache.incr(key)
+        except ValueError:
+            get_version(path)
+            response_cache.incr(key)
+
+
+def _is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Токен CSRF в странице привязан к куке первого посетителя
+        and not request.META.get('CSRF_COOKIE_USED')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _from_cache(request, response):
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response,
+    )
+
+
+class AnonymousResponseCacheMiddleware:
+    """Отдаёт анонимам закэшированные страницы ``@cache_anonymous``.
+
+    Ставится после ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_response_cache_key', None)
+        if key is not None:
+            response_cache = get_cache()
+            if _is_cacheable(request, response):
+                if hasattr(response, 'render'):
+                    response.render()
+                response_cache.set(
+                    key, response, settings.RESPONSE_CACHE_TIMEOUT
+                )
+            response_cache.delete(LOCK_KEY.format(key))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or not getattr(view_func, 'cache_anonymous', False)
+            or request.user.is_authenticated
+        ):
+            return None
+        path = request.path
+        key = RESPONSE_KEY.format(
+            get_version(path), _digest(request.get_full_path())
+        )
+        response_cache = get_cache()
+        response = response_cache.get(key)
+        if response is not None:
+            return _from_cache(request, response)
+        timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        if response_cache.add(LOCK_KEY.format(key), 1, timeout):
+            request._response_cache_key = key
+            return None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            response = response_cache.get(key)
+            if response is not None:
+                return _from_cache(request, response)
+            if not response_cache.has_key(LOCK_KEY.format(key)):
+                # Ответ вышел некэшируемым: рендерим сами
+                break
+        return None
@@ -0,0 +1,105 @@
+"""Предкомпиляция и проверка шаблонов проекта.
+
+Шаблоны грузятся через ``django.template.loaders.cached.Loader`` (см.
+``settings.TEMPLATES``): разобранный шаблон живёт в памяти процесса, и
+диск читается только при первом рендере. :func:`warm` делает этот
+первый разбор при старте воркера, а не на первом запросе каждой
+страницы. Вместе с шаблоном разбираются и те, на которые он ссылается
+в ``{% extends %}`` и ``{% include %}`` постоянным именем, — с теми же
+ключами кэша, что при рендере.
+"""
+import logging
+import os
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.loader_tags import ExtendsNode, IncludeNode
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.html', '.txt')
+
+
+def get_engine():
+    return engines['django'].engine
+
+
+def template_dirs(engine):
+    """Каталоги шаблонов проекта: DIRS и templates/ своих приложений."""
+    dirs = list(engine.dirs)
+    for app_config in apps.get_app_configs():
+        path = os.path.join(app_config.path, 'templates')
+        own = app_config.path.startswith(settings.BASE_DIR)
+        if own and os.path.isdir(path):
+            dirs.append(path)
+    return dirs
+
+
+def template_names(engine):
+    names = set()
+    for directory in template_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(EXTENSIONS):
+                    names.add(os.path.relpath(
+                        os.path.join(root, filename), directory
+                    ).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def _constant_name(expression):
+    """Имя шаблона, если оно задано строкой, а не переменной."""
+    if isinstance(expression.var, str) and not expression.filters:
+        return expression.var
+    return None
+
+
+def compile_template(engine, name):
+    """Разбирает шаблон и его постоянные extends/include.
+
+    Возвращает список ошибок ``(шаблон, сообщение)``.
+    """
+    try:
+        template = engine.get_template(name)
+    except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+        return [(name, f'{type(exc).__name__}: {exc}')]
+    errors = []
+    for node in template.nodelist.get_nodes_by_type(
+        (ExtendsNode, IncludeNode)
+    ):
+        if isinstance(node, ExtendsNode):
+            parent = _constant_name(node.parent_name)
+            # Ключ кэша как у ExtendsNode.find_template
+            load = partial(engine.find_template, skip=[template.origin])
+        else:
+            parent = _constant_name(node.template)
+            load = engine.get_template
+        if parent is None:
+            continue
+        try:
+            load(parent)
+        except TemplateDoesNotExist:
+            errors.append((name, f'нет шаблона {parent!r}'))
+        except TemplateSyntaxError as exc:
+            errors.append((parent, f'TemplateSyntaxError: {exc}'))
+    return errors
+
+
+def compile_all(engine=None):
+    """Разбирает все шаблоны проекта: (сколько, ошибки)."""
+    engine = engine or get_engine()
+    names = template_names(engine)
+    errors = []
+    for name in names:
+        errors.extend(compile_template(engine, name))
+    return len(names), errors
+
+
+def warm():
+    """Заполняет кэш шаблонов при старте процесса; ошибки — в лог."""
+    count, errors = compile_all()
+    for name, message in errors:
+        logger.error('Шаблон %s: %s', name, message)
+    return count
@@ -0,0 +1,17 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/page_window.html', takes_context=True)
+def page_window(context, page_obj, on_each_side=2):
+    """Навигация по окну страниц курсорного паджинатора.
+
+    ``page_query`` из контекста — другие параметры запроса, которые
+    нужно сохранить, с завершающим «&».
+    """
+    return {
+        'page_obj': page_obj,
+        'links': page_obj.paginator.get_page_window(page_obj, on_each_side),
+        'page_query': context.get('page_query', ''),
+    }
@@ -0,0 +1,173 @@
+"""Минимальный сервер с протоколом Redis для тестов кэша.
+
+Поддерживает только команды, которые использует ``core.redis_cache``,
+и хранит данные в памяти процесса.
+"""
+import fnmatch
+import re
+import socketserver
+import threading
+import time
+
+from core.redis_cache import INCR_SCRIPT, RespError, read_reply
+
+
+def encode_reply(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, RespError):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(map(encode_reply, value))
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, name, *args):
+        handler = getattr(self, 'cmd_' + name.decode().lower(), None)
+        if handler is None:
+            return RespError(f'unknown command {name!r}')
+        with self.lock:
+            return handler(*args)
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            ms = int(options[options.index(b'PX') + 1])
+            self.expires[key] = time.monotonic() + ms / 1000
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += self._alive(key)
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def cmd_exists(self, key):
+        return int(self._alive(key))
+
+    def cmd_incrby(self, key, delta):
+        if not self._alive(key):
+            self.data[key] = b'0'
+        try:
+            value = int(self.data[key]) + int(delta)
+        except ValueError:
+            return RespError('value is not an integer')
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_eval(self, script, numkeys, *args):
+        # Скриптов Lua здесь нет: известные скрипты бэкенда повторены
+        # на Python
+        if script.decode() != INCR_SCRIPT:
+            return RespError('unknown script')
+        key, delta = args
+        return self.cmd_incrby(key, delta) if self._alive(key) else None
+
+    def cmd_pexpire(self, key, ms):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        alive = self._alive(key)
+        return int(alive and self.expires.pop(key, None) is not None)
+
+    def cmd_scan(self, cursor, *options):
+        # Весь обход за один вызов: курсор сразу возвращается нулевым
+        names = [option.upper() for option in options]
+        pattern = b'*'
+        if b'MATCH' in names:
+            pattern = options[names.index(b'MATCH') + 1]
+        # В fnmatch нет экранирования обратной косой чертой
+        pattern = re.sub(rb'\\(.)', rb'[\1]', pattern)
+        keys = [
+            key for key in list(self.data)
+            if self._alive(key) and fnmatch.fnmatchcase(key, pattern)
+        ]
+        return [b'0', keys]
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            self.wfile.write(encode_reply(self.server.store.execute(*command)))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """Сервер на свободном порту localhost, работающий в фоновом потоке.
+
+    Использование::
+
+        with RespServer() as server:
+            location = server.location
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.store = Store()
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def location(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from core import metrics
+from core.views import prometheus_metrics
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from posts import thumbnails
+
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for name in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, name))
+        # Файл процесса удалён: пусть откроется заново
+        metrics._store = None
+        self.client = Client()
+
+    def test_requests_counted_per_view(self):
+        '''Ответы считаются по вьюхам и кодам, время — гистограммой'''
+        self.client.get(reverse('posts:index'))
+        self.client.get('/missing-page/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"} 1', text
+        )
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="404",'
+            'view="<unresolved>"} 1', text
+        )
+        self.assertIn('yatube_http_request_duration_seconds_bucket'
+                      '{view="posts:index",le="+Inf"} 1', text)
+        self.assertIn('yatube_http_request_duration_seconds_count'
+                      '{view="posts:index"} 1', text)
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+
+    def test_processes_are_summed(self):
+        '''Значения из файлов разных процессов складываются'''
+        metrics.REQUESTS.inc(view='posts:index', method='GET', status=200)
+        other = metrics.FileStore(os.path.join(METRICS_DIR, 'metrics-1.db'))
+        other.inc(metrics._key(metrics.REQUESTS.name, {
+            'view': 'posts:index', 'method': 'GET', 'status': '200',
+        }), 2)
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"} 3', metrics.render()
+        )
+
+    def test_threads_do_not_lose_increments(self):
+        '''Счётчик не теряет прибавления из разных потоков'''
+        counter = metrics.Counter('test_threads_total', 'Тест')
+        metrics.Metric.registry.remove(counter)
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        workers = [threading.Thread(target=work) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        key = metrics._key('test_threads_total', {})
+        self.assertEqual(metrics.collect()[key], 8000)
+
+    def test_store_grows_and_reopens(self):
+        '''Файл растёт по мере надобности, значения переживают перезапуск'''
+        path = os.path.join(METRICS_DIR, 'metrics-2.db')
+        store = metrics.FileStore(path)
+        for number in range(3000):
+            store.inc(f'ключ-{number}', number)
+        reopened = metrics.FileStore(path)
+        reopened.inc('ключ-2999')
+        totals = metrics.collect()
+        self.assertEqual(totals['ключ-2999'], 3000)
+        self.assertEqual(len(totals), 3000)
+
+    def test_cache_hit_ratio(self):
+        '''Попадания и промахи кэшей дают долю попаданий'''
+        metrics.MetricsMiddleware(lambda request: HttpResponse())
+        cache.set('metrics-test', 1)
+        cache.get('metrics-test')
+        cache.get('metrics-missing')
+        self.assertIn('yatube_cache_hit_ratio{cache="default"} 0.5',
+                      metrics.render())
+
+    def test_thumbnail_time(self):
+        '''Время подготовки копий картинок попадает в гистограмму'''
+        thumbnails.generate(0, 'posts/missing.png')
+        self.assertIn('yatube_thumbnail_duration_seconds_count'
+                      '{result="skipped"} 1', metrics.render())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        '''С METRICS_TOKEN метрики отдаются только с токеном'''
+        request = RequestFactory()
+        self.assertEqual(
+            prometheus_metrics(request.get('/metrics')).status_code, 401
+        )
+        response = prometheus_metrics(request.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        ))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,99 @@
+from core import profiling, response_cache
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, modify_settings
+from django.urls import reverse
+from posts.models import Post
+
+User = get_user_model()
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'core.profiling.ProfilingMiddleware'})
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.staff = User.objects.create(username='test_staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        profiling.history.clear()
+        response_cache.get_cache().clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header(self):
+        '''В ответе есть Server-Timing с SQL, шаблонами и кэшем'''
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(metric, timing)
+        profile = profiling.history[-1]
+        self.assertEqual(profile.path, reverse('posts:index'))
+        self.assertEqual(profile.status, 200)
+        self.assertTrue(profile.queries)
+
+    def test_templates_recorded(self):
+        '''Записываются страница, base.html и includes'''
+        self.client.get(reverse('posts:index'))
+        templates = profiling.history[-1].templates
+        for name in ('posts/index.html', 'base.html',
+                     'includes/header.html', 'includes/footer.html'):
+            self.assertIn(name, templates)
+        self.assertGreater(profiling.history[-1].template_time, 0)
+
+    def test_cache_hits_and_misses(self):
+        '''Считаются попадания и промахи по псевдонимам кэшей'''
+        cache.set('profiling-test', 1)
+
+        def view(request):
+            cache.get('profiling-test')
+            cache.get('profiling-missing')
+            cache.get_many(['profiling-test', 'profiling-missing'])
+            return HttpResponse()
+
+        middleware = profiling.ProfilingMiddleware(view)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(profiling.history[-1].cache['default'], (2, 2))
+
+    def test_duplicate_queries(self):
+        '''Повторы одного запроса видны отдельно'''
+        def view(request):
+            for _ in range(3):
+                list(Post.objects.filter(author=self.user))
+            list(Post.objects.filter(author=self.staff))
+            return HttpResponse()
+
+        profiling.ProfilingMiddleware(view)(RequestFactory().get('/'))
+        profile = profiling.history[-1]
+        self.assertEqual(len(profile.duplicates), 1)
+        self.assertEqual(profile.duplicates[0][0], 3)
+        self.assertEqual(profile.similar[0][0], 4)
+
+    def test_ring_buffer(self):
+        '''Хранятся только последние PROFILING_HISTORY запросов'''
+        middleware = profiling.ProfilingMiddleware(lambda request: (
+            HttpResponse()
+        ))
+        for number in range(profiling.history.maxlen + 5):
+            middleware(RequestFactory().get(f'/?page={number}'))
+        self.assertEqual(len(profiling.history), profiling.history.maxlen)
+        self.assertEqual(
+            profiling.history[-1].path,
+            f'/?page={profiling.history.maxlen + 4}',
+        )
+
+    def test_page_only_for_staff(self):
+        '''Страница профилей открыта только персоналу'''
+        url = reverse('core:profiling')
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertContains(response, '<code>GET /</code>')
+        self.assertNotIn('Server-Timing', response)
+        # Шаблон получает снимок, а не итератор по общей истории
+        self.assertIsInstance(response.context['profiles'], list)
@@ -0,0 +1,176 @@
+import threading
+import time
+from unittest import mock
+
+from core import redis_cache
+from core.redis_cache import RedisCache
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import cache as feed_cache
+from posts.models import Post
+
+from .resp_server import RespServer
+
+User = get_user_model()
+
+
+class RedisCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def make_cache(self, **params):
+        params.setdefault('KEY_PREFIX', 'test')
+        return RedisCache(self.server.location, params)
+
+    def setUp(self):
+        self.cache = self.make_cache()
+        self.cache.clear()
+
+    def test_basic_operations(self):
+        '''Бэкенд поддерживает основные операции кэша Django'''
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 'два'}
+        )
+        self.assertEqual(self.cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete_many(['a', 'b'])
+        self.assertFalse(self.cache.has_key('a'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_incr_does_not_create_key(self):
+        '''incr проверяет ключ и увеличивает его одной командой'''
+        self.cache.set('counter', 1)
+        with mock.patch.object(
+            self.cache.pool, 'execute', wraps=self.cache.pool.execute
+        ) as execute:
+            self.assertEqual(self.cache.incr('counter', 2), 3)
+        execute.assert_called_once()
+        self.cache.delete('counter')
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+        self.assertFalse(self.cache.has_key('counter'))
+
+    def test_timeouts(self):
+        '''Ключи истекают по TTL, timeout=None хранит вечно'''
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('forever', 1, timeout=None)
+        self.cache.set('gone', 1, timeout=0)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.touch('forever', 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('forever'))
+
+    def test_prefix_and_version_isolation(self):
+        '''Префикс и версия разделяют пространства ключей'''
+        other_prefix = self.make_cache(KEY_PREFIX='other')
+        self.cache.set('key', 'v1')
+        self.cache.set('key', 'v2', version=2)
+        self.assertIsNone(other_prefix.get('key'))
+        self.assertEqual(self.cache.get('key'), 'v1')
+        self.assertEqual(self.cache.get('key', version=2), 'v2')
+
+    def test_clear_keeps_other_prefixes(self):
+        '''clear удаляет только ключи своего префикса'''
+        other_prefix = self.make_cache(KEY_PREFIX='other')
+        self.addCleanup(other_prefix.clear)
+        similar = self.make_cache(KEY_PREFIX='test*')
+        self.addCleanup(similar.clear)
+        self.cache.set('key', 1)
+        self.cache.set('key', 2, version=2)
+        other_prefix.set('key', 3)
+        similar.set('key', 4)
+        similar.clear()
+        self.assertIsNone(similar.get('key'))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.cache.get('key', version=2))
+        self.assertEqual(other_prefix.get('key'), 3)
+
+    def test_failed_connection_is_dropped(self):
+        '''Соединение с любой ошибкой закрывается и не идёт в пул'''
+        self.cache.set('key', 1)
+        Connection = redis_cache.Connection
+        with mock.patch.object(
+            redis_cache, 'read_reply', side_effect=ValueError
+        ), mock.patch.object(
+            Connection, 'close', autospec=True, side_effect=Connection.close
+        ) as close:
+            with self.assertRaises(ValueError):
+                self.cache.get('key')
+        close.assert_called_once()
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_values_are_shared_and_connections_pooled(self):
+        '''Экземпляры в разных потоках видят одни данные через пул'''
+        connections = self.server.connections
+        self.cache.set('shared', 'из первого потока')
+        result = {}
+
+        def worker():
+            result['value'] = self.make_cache().get('shared')
+
+        for _ in range(5):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        self.assertEqual(result['value'], 'из первого потока')
+        self.assertLessEqual(self.server.connections - connections, 1)
+
+
+class SharedFeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().__enter__()
+        backend = {
+            'BACKEND': 'core.redis_cache.RedisCache',
+            'LOCATION': cls.server.location,
+        }
+        cls.settings_override = override_settings(CACHES={
+            'default': dict(backend, KEY_PREFIX='default'),
+            'template_fragments': dict(backend, KEY_PREFIX='fragments'),
+        })
+        cls.settings_override.enable()
+        cls.user = User.objects.create(username='test_author')
+        cls.post = Post.objects.create(author=cls.user, text='Общий кэш')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def test_invalidation_reaches_other_workers(self):
+        '''Версия ленты, сброшенная в одном потоке, видна в другом'''
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Общий кэш')
+        version = feed_cache.get_version(feed_cache.INDEX)
+        thread = threading.Thread(
+            target=feed_cache.bump, args=(feed_cache.INDEX,)
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(
+            feed_cache.get_version(feed_cache.INDEX), version + 1
+        )
+        self.assertTrue(any(
+            key.startswith(b'fragments:') for key in self.server.store.data
+        ))
@@ -0,0 +1,110 @@
+import threading
+
+from core import response_cache
+from core.response_cache import AnonymousResponseCacheMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class AnonymousResponseCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.guest_client = Client()
+
+    def group_url(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+    def test_anonymous_page_cached_until_invalidated(self):
+        '''Анониму страница отдаётся из кэша, пока пост не изменится'''
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertContains(response, 'Тестовый пост')
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.assertContains(self.guest_client.get(url), 'Без сигнала')
+
+    def test_authenticated_not_cached(self):
+        '''Вошедшим страница рендерится заново'''
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('posts:index')
+        client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        self.assertContains(client.get(url), 'Без сигнала')
+
+    def test_invalidation_is_scoped(self):
+        '''Новый пост сбрасывает свою группу со всеми страницами, не чужую'''
+        urls = (
+            self.group_url(self.group),
+            self.group_url(self.group) + '?cursor=x',
+            self.group_url(self.other_group),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        for url, cached in zip(urls, (False, False, True)):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(url)
+                self.assertEqual(not queries, cached)
+
+    def anonymous_requests(self, count):
+        requests = [RequestFactory().get('/') for _ in range(count)]
+        for request in requests:
+            request.user = AnonymousUser()
+        return requests
+
+    def test_waits_for_locked_miss(self):
+        '''Пока промах рендерит один запрос, другие ждут его ответ'''
+        rendered = HttpResponse('Отрендерено один раз')
+        middleware = AnonymousResponseCacheMiddleware(lambda r: rendered)
+        view = response_cache.cache_anonymous(HttpResponse)
+        first, second = self.anonymous_requests(2)
+        self.assertIsNone(middleware.process_view(first, view, (), {}))
+        timer = threading.Timer(0.1, middleware, args=(first,))
+        timer.start()
+        response = middleware.process_view(second, view, (), {})
+        timer.join()
+        self.assertEqual(response.content, rendered.content)
+
+    def test_uncacheable_response_releases_waiters(self):
+        '''Ответ с кукой не кэшируется, и ждущие рендерят сами'''
+        response = HttpResponse()
+        response.set_cookie('name', 'value')
+        middleware = AnonymousResponseCacheMiddleware(lambda r: response)
+        view = response_cache.cache_anonymous(HttpResponse)
+        first, second = self.anonymous_requests(2)
+        middleware.process_view(first, view, (), {})
+        middleware(first)
+        self.assertIsNone(middleware.process_view(second, view, (), {}))
+        self.assertTrue(hasattr(second, '_response_cache_key'))
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from core import response_cache, template_warmup
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Group, Post
+
+User = get_user_model()
+
+TEMP_TEMPLATES = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class TemplateWarmupTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_TEMPLATES, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_project_templates_are_valid(self):
+        '''Все шаблоны проекта разбираются без ошибок'''
+        count, errors = template_warmup.compile_all()
+        self.assertEqual(errors, [])
+        self.assertGreater(count, 20)
+
+    def test_warm_covers_feed_pages(self):
+        '''После прогрева страницы лент не разбирают новых шаблонов'''
+        loader = template_warmup.get_engine().template_loaders[0]
+        loader.reset()
+        template_warmup.warm()
+        warmed = set(loader.get_template_cache)
+        response_cache.get_cache().clear()
+        client = Client()
+        client.force_login(self.user)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ):
+            self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(set(loader.get_template_cache) - warmed, set())
+
+    def test_broken_templates_reported(self):
+        '''Ошибки синтаксиса и ссылки на несуществующие шаблоны видны'''
+        for name, text in (
+            ('broken.html', '{% if %}'),
+            ('orphan.html', '{% include "missing.html" %}'),
+            ('ok.html', '{% include name %}'),
+        ):
+            with open(os.path.join(TEMP_TEMPLATES, name), 'w') as file:
+                file.write(text)
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [TEMP_TEMPLATES],
+        }]
+        with override_settings(TEMPLATES=templates):
+            count, errors = template_warmup.compile_all()
+            self.assertEqual(count, 3)
+            self.assertEqual(
+                sorted(name for name, _ in errors),
+                ['broken.html', 'orphan.html'],
+            )
+            with self.assertRaises(CommandError):
+                call_command('compile_templates', stderr=StringIO())
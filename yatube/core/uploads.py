@@ -0,0 +1,82 @@
+"""Приём загружаемых файлов с ограничением размера.
+
+``SizeLimitUploadHandler`` стоит первым в ``FILE_UPLOAD_HANDLERS`` и
+перестаёт передавать данные дальше, как только файл превысил
+``FILE_UPLOAD_MAX_SIZE``; вместо файла форма получает
+``RejectedUpload``. Это пустой файл нулевого размера, поэтому любое
+``FileField`` (и в админке, и в чужих формах) отклоняет его как пустой
+и ничего не сохраняет, а ``PostForm`` сообщает о пределе размера.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, приём которого прерван из-за размера.
+
+    ``received`` — сколько байт пришло до обрыва, ``limit`` — предел.
+    """
+
+    def __init__(self, name, received, limit, content_type=None):
+        super().__init__(BytesIO(), name, content_type, 0)
+        self.received = received
+        self.limit = limit
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.limit = settings.FILE_UPLOAD_MAX_SIZE
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.limit is not None and self.received > self.limit:
+            # Дальше данные не идут ни в память, ни во временный файл
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.limit is not None and self.received > self.limit:
+            return RejectedUpload(
+                self.file_name, self.received, self.limit, self.content_type
+            )
+        return None
+
+
+def normalize_orientation(upload):
+    """Поворачивает картинку по EXIF Orientation.
+
+    ``upload.image`` — открытая, но не декодированная картинка, которую
+    оставляет ``forms.ImageField``. Пиксели декодируются только если
+    картинку действительно нужно повернуть.
+    """
+    # EXIF берётся из заголовка: getexif() у PNG декодирует картинку
+    data = upload.image.info.get('exif')
+    if not data:
+        return upload
+    exif = Image.Exif()
+    exif.load(data)
+    if exif.get(EXIF_ORIENTATION, 1) == 1:
+        return upload
+    # Pillow не умеет записывать MPO, а это обычный JPEG с телефона
+    image_format = upload.image.format.replace('MPO', 'JPEG')
+    upload.seek(0)
+    with Image.open(upload) as image:
+        rotated = ImageOps.exif_transpose(image)
+    buffer = BytesIO()
+    rotated.save(buffer, format=image_format, quality=90)
+    size = buffer.tell()
+    buffer.seek(0)
+    normalized = InMemoryUploadedFile(
+        buffer, getattr(upload, 'field_name', None), upload.name,
+        upload.content_type, size, None,
+    )
+    normalized.image = rotated
+    return normalized
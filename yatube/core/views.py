@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+from . import profiling as profiler
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -13,3 +19,23 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling(request):
+    """Последние запросы, записанные ProfilingMiddleware."""
+    return render(request, 'core/profiling.html', {
+        'enabled': settings.PROFILING_ENABLED,
+        # Копия: другие потоки дописывают историю, пока идёт рендеринг
+        'profiles': list(reversed(profiler.history)),
+    })
+
+
+def prometheus_metrics(request):
+    """Метрики всех процессов для Prometheus."""
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
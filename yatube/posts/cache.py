@@ -0,0 +1,147 @@
+"""Версии лент для кэша фрагментов.
+
+Каждая лента (главная, группа, автор) имеет свой счётчик версии в кэше.
+Версия входит в ключ закэшированного фрагмента, поэтому сигналы об
+изменении постов, комментариев и групп инвалидируют ровно те ленты,
+которые затронуты, не дожидаясь истечения TTL. Вместе с версией
+запоминается время сброса — из него складывается Last-Modified.
+"""
+import time
+
+from core import response_cache
+from django.core.cache import InvalidCacheBackendError, caches
+from django.urls import NoReverseMatch, reverse
+
+from .models import Group
+
+HITS_KEY = 'feed_cache:hits'
+MISSES_KEY = 'feed_cache:misses'
+VERSION_KEY = 'feed_version:{}'
+MODIFIED_KEY = 'feed_modified:{}'
+INDEX = 'index'
+
+
+def get_cache():
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def profile_scope(user_id):
+    """Шапка профиля: счётчики подписок и кнопка подписки."""
+    return f'profile:{user_id}'
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope)
+    fragment_cache = get_cache()
+    version = fragment_cache.get(key)
+    if version is None:
+        # Начальная версия от времени, чтобы после вытеснения счётчика
+        # не совпасть с ещё живыми фрагментами старых версий
+        fragment_cache.add(key, int(time.time() * 1000), None)
+        version = fragment_cache.get(key)
+    return version
+
+
+def bump(*scopes):
+    """Увеличивает версии лент ``scopes``, инвалидируя их фрагменты."""
+    fragment_cache = get_cache()
+    for scope in set(scopes):
+        key = VERSION_KEY.format(scope)
+        try:
+            fragment_cache.incr(key)
+        except ValueError:
+            get_version(scope)
+            fragment_cache.incr(key)
+    now = time.time()
+    fragment_cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def get_modified(*scopes):
+    """Время (Unix time) последнего сброса версии любой из ``scopes``."""
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    fragment_cache = get_cache()
+    stamps = fragment_cache.get_many(keys)
+    for key in set(keys) - stamps.keys():
+        # Отметка вытеснена, и когда лента менялась, неизвестно:
+        # считаем, что только что
+        now = time.time()
+        fragment_cache.add(key, now, None)
+        stamps[key] = fragment_cache.get(key, now)
+    return max(stamps.values())
+
+
+def bump_post(post, *group_ids):
+    """Инвалидирует ленты и страницы, на которых показывается ``post``."""
+    group_ids = {
+        group_id for group_id in (post.group_id, *group_ids)
+        if group_id is not None
+    }
+    bump(
+        INDEX,
+        author_scope(post.author_id),
+        *(group_scope(group_id) for group_id in group_ids),
+    )
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ) if group_ids else ()
+    invalidate_pages(
+        ('posts:index',),
+        ('posts:profile', post.author.username),
+        ('posts:post_detail', post.pk),
+        *(('posts:group_list', slug) for slug in slugs),
+    )
+
+
+def invalidate_pages(*pages):
+    """Сбрасывает кэш ответов страниц ``(имя URL, *аргументы)``."""
+    paths = []
+    for name, *args in pages:
+        try:
+            paths.append(reverse(name, args=args))
+        except NoReverseMatch:
+            # Слаг или имя, заданные в обход форм, страницы не имеют
+            continue
+    response_cache.invalidate(*paths)
+
+
+def _count(key):
+    fragment_cache = get_cache()
+    fragment_cache.add(key, 0, None)
+    try:
+        fragment_cache.incr(key)
+    except ValueError:
+        pass
+
+
+def record_hit():
+    _count(HITS_KEY)
+
+
+def record_miss():
+    _count(MISSES_KEY)
+
+
+def stats():
+    """Счётчики попаданий и промахов кэша лент."""
+    values = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
@@ -0,0 +1,135 @@
+"""Условный GET для публичных страниц постов.
+
+ETag страницы складывается из версий лент, которые она показывает
+(см. ``posts.cache``), и зрителя — для вошедшего вместе с его
+CSRF-токеном: списки постов одинаковы для всех, а шапка, кнопки и
+формы — нет. Last-Modified — самое позднее из даты свежего поста,
+которую даёт один проход по индексу, времени сброса версий и входа
+зрителя: правка и удаление поста дату не меняют, но сбрасывают версии.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache, thumbnails
+from .models import Comment, Group, Post, User
+
+
+def _latest(queryset, field='pub_date'):
+    """Самое позднее значение ``field``: ORDER BY по индексу и LIMIT 1."""
+    return queryset.order_by(f'-{field}').values_list(field, flat=True)[:1]
+
+
+def index_state():
+    return [cache.INDEX], _latest(Post.objects).first()
+
+
+def group_state(slug):
+    row = Group.objects.filter(slug=slug).annotate(
+        last=Subquery(_latest(Post.objects.filter(group=OuterRef('pk'))))
+    ).values_list('pk', 'last').first()
+    if row is None:
+        return None
+    group_id, last = row
+    return [cache.group_scope(group_id)], last
+
+
+def profile_state(username):
+    row = User.objects.filter(username=username).annotate(
+        last=Subquery(_latest(Post.objects.filter(author=OuterRef('pk'))))
+    ).values_list('pk', 'last').first()
+    if row is None:
+        return None
+    author_id, last = row
+    scopes = [cache.author_scope(author_id), cache.profile_scope(author_id)]
+    return scopes, last
+
+
+def post_state(post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(_latest(
+            Comment.objects.filter(post=OuterRef('pk')), 'created'
+        ))
+    ).values_list('author_id', 'pub_date', 'last_comment').first()
+    if row is None:
+        return None
+    author_id, pub_date, last_comment = row
+    # Счётчики поста и автора меняются вместе с версией ленты автора
+    return [cache.author_scope(author_id)], max(
+        filter(None, (pub_date, last_comment))
+    )
+
+
+def _validators(request, state):
+    if state is None:
+        return None, None
+    scopes, last = state
+    versions = [cache.get_version(scope) for scope in scopes]
+    # Страницы вошедших содержат формы с CSRF-токеном, а он и сессия
+    # меняются при каждом входе: страница от прежнего входа не должна
+    # отдаваться как 304. get_token заводит токен, если его ещё нет, —
+    # тот же попадёт в формы
+    viewer, login = request.user.pk, None
+    if request.user.is_authenticated:
+        get_token(request)
+        viewer = (f'{viewer}:{request.session.session_key}:'
+                  f'{request.META["CSRF_COOKIE"]}')
+        login = request.user.last_login
+    etag = hashlib.md5(f'{viewer}:{versions}'.encode()).hexdigest()
+    modified = datetime.fromtimestamp(
+        cache.get_modified(*scopes), timezone.utc
+    )
+    return etag, max(filter(None, (modified, last, login)))
+
+
+def feed_condition(get_state):
+    """Отвечает 304 на условный GET, не выполняя вьюху.
+
+    ``get_state`` получает аргументы вьюхи и возвращает
+    ``(scopes, дата свежего поста)`` или None, если страницы нет.
+    Анонимные ответы помечаются публичными, чтобы их мог отдавать
+    обратный прокси, ответы вошедшим — только для браузера. Страница с
+    заглушкой картинки не кэшируется нигде и валидаторов не получает.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_feed_validators'):
+            request._feed_validators = _validators(
+                request, get_state(*args, **kwargs)
+            )
+        return request._feed_validators
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda *args, **kwargs: validators(*args, **kwargs)[0],
+            last_modified_func=(
+                lambda *args, **kwargs: validators(*args, **kwargs)[1]
+            ),
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if thumbnails.has_pending(request):
+                del response['ETag']
+                del response['Last-Modified']
+                patch_cache_control(
+                    response, private=True, no_cache=True, no_store=True
+                )
+            elif request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=0,
+                    s_maxage=settings.FEED_PROXY_MAX_AGE,
+                )
+            return response
+        return wrapper
+    return decorator
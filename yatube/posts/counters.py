@@ -0,0 +1,41 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from users.models import Profile
+
+from .models import Comment, Follow, Post, User
+
+
+def change(queryset, *fields, delta=1):
+    """Атомарно сдвигает счётчики ``fields`` у строк ``queryset``."""
+    queryset.update(**{
+        field: Greatest(F(field) + delta, 0) for field in fields
+    })
+
+
+def count_of(model, field, outer='pk'):
+    """Подзапрос: число строк ``model``, у которых ``field`` = ``outer``."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики по исходным таблицам."""
+    Profile.objects.bulk_create(
+        Profile(user_id=pk)
+        for pk in User.objects.filter(
+            profile__isnull=True
+        ).values_list('pk', flat=True)
+    )
+    profiles = Profile.objects.update(
+        posts_count=count_of(Post, 'author', 'user'),
+        followers_count=count_of(Follow, 'author', 'user'),
+        following_count=count_of(Follow, 'user', 'user'),
+    )
+    posts = Post.objects.update(comments_count=count_of(Comment, 'post'))
+    return profiles, posts
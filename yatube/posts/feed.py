@@ -0,0 +1,218 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Пост при публикации раскладывается в ``FeedItem`` каждого подписчика,
+поэтому ``follow_index`` читает ленту одним проходом по индексу
+``(user, -pub_date, -post)``. Посты авторов с огромным числом подписчиков
+не раскладываются: они подмешиваются к ленте при чтении.
+"""
+from itertools import chain
+from operator import attrgetter
+
+from core.paginator import NEXT, CursorPaginator
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from users.models import Profile
+
+from .models import FeedItem, Follow, Post, PostQuerySet
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def celebrity_authors(user):
+    """id авторов из подписок ``user``, чьи посты читаются без fan-out."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=(
+            settings.FEED_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values_list('author_id', flat=True))
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).distinct()
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, *author_ids):
+    """Кладёт в ленту ``user_id`` последние посты авторов ``author_ids``.
+
+    Один INSERT ... SELECT на всех авторов; посты «знаменитых» авторов
+    не кладутся.
+    """
+    if not author_ids:
+        return 0
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        # WHERE перед ON CONFLICT обязателен: иначе SQLite примет
+        # ON за условие соединения в SELECT
+        cursor.execute(f"""
+            INSERT INTO {quote(FeedItem._meta.db_table)}
+                (user_id, post_id, pub_date)
+            SELECT %s, post.id, post.pub_date
+            FROM (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                ) AS position
+                FROM {quote(Post._meta.db_table)}
+                WHERE author_id IN ({placeholders})
+            ) post
+            LEFT JOIN {quote(Profile._meta.db_table)} profile
+                ON profile.user_id = post.author_id
+            WHERE COALESCE(profile.followers_count, 0) <= %s
+                AND post.position <= %s
+            ON CONFLICT DO NOTHING
+        """, [user_id, *author_ids, settings.FEED_FANOUT_MAX_FOLLOWERS,
+              settings.FEED_BACKFILL_LIMIT])
+        return cursor.rowcount
+
+
+def remove_authors(user_id, *author_ids):
+    """Убирает посты авторов из ленты ``user_id`` после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).delete()
+
+
+def _fill(author_ids=None):
+    """Кладёт последние посты авторов в ленты их подписчиков.
+
+    Один INSERT ... SELECT; без ``author_ids`` — по всем подпискам.
+    """
+    quote = connection.ops.quote_name
+    authors, params = '', []
+    if author_ids is not None:
+        authors = f"WHERE author_id IN ({', '.join(['%s'] * len(author_ids))})"
+        params = list(author_ids)
+    with connection.cursor() as cursor:
+        # WHERE перед ON CONFLICT обязателен: иначе SQLite примет
+        # ON за условие соединения в SELECT
+        cursor.execute(f"""
+            INSERT INTO {quote(FeedItem._meta.db_table)}
+                (user_id, post_id, pub_date)
+            SELECT follow.user_id, post.id, post.pub_date
+            FROM {quote(Follow._meta.db_table)} follow
+            LEFT JOIN {quote(Profile._meta.db_table)} profile
+                ON profile.user_id = follow.author_id
+            JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                ) AS position
+                FROM {quote(Post._meta.db_table)}
+                {authors}
+            ) post ON post.author_id = follow.author_id
+            WHERE COALESCE(profile.followers_count, 0) <= %s
+                AND post.position <= %s
+            ON CONFLICT DO NOTHING
+        """, [*params, settings.FEED_FANOUT_MAX_FOLLOWERS,
+              settings.FEED_BACKFILL_LIMIT])
+        return cursor.rowcount
+
+
+def backfill_former_celebrities(*author_ids):
+    """Раскладывает посты авторов, которые перестали быть «знаменитыми».
+
+    Вызывается после отписки от ``author_ids``: пока у автора было
+    больше ``FEED_FANOUT_MAX_FOLLOWERS`` подписчиков, его посты в ленты
+    не попадали, а подмешивались при чтении. Отписка уменьшает счётчик
+    на один, поэтому порог пересекли те, у кого он ровно на пороге.
+    """
+    dropped = list(Profile.objects.filter(
+        user_id__in=author_ids,
+        followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('user_id', flat=True))
+    if dropped:
+        _fill(dropped)
+
+
+def rebuild():
+    """Заново заполняет ленты всех читателей одним INSERT ... SELECT.
+
+    Результат тот же, что у :func:`backfill` по каждой подписке, но без
+    выборки постов в Python; нужен после массовой загрузки данных.
+    """
+    FeedItem.objects.all().delete()
+    return _fill()
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок.
+
+    Страница собирается из материализованной ленты и постов
+    «знаменитых» авторов; оба источника читаются по одному ключу
+    ``(pub_date, id)`` и сливаются.
+    """
+
+    def __init__(self, user, per_page, **kwargs):
+        self.user_id = user.pk
+        self.celebrities = celebrity_authors(user)
+        self.items = CursorPaginator(
+            FeedItem.objects.filter(user=user).select_related(
+                'post__author', 'post__group'
+            ).defer(*(
+                'post__' + name for name in PostQuerySet.FEED_DEFERRED_FIELDS
+            )).prefetch_related('post__image_variants'),
+            per_page,
+            ordering=('-pub_date', '-post_id'),
+        )
+        super().__init__(
+            Post.objects.for_feed().filter(author_id__in=self.celebrities),
+            per_page,
+            **kwargs
+        )
+
+    @property
+    def approximate_count(self):
+        """Записи материализованной ленты плюс посты «знаменитостей»."""
+        if self.count_timeout is None:
+            return None
+
+        def count():
+            total = self.items.object_list.count()
+            if self.celebrities:
+                total += self.object_list.count()
+            return total
+
+        return cache.get_or_set(
+            f'paginator_count:feed:{self.user_id}', count, self.count_timeout
+        )
+
+    def merge(self, pushed, pulled, direction, limit):
+        posts = {post.pk: post for post in chain(pushed, pulled)}
+        return sorted(posts.values(), key=attrgetter('pub_date', 'pk'),
+                      reverse=direction == NEXT)[:limit]
+
+    def fetch(self, values, direction, limit):
+        pulled = []
+        if self.celebrities:
+            pulled = super().fetch(values, direction, limit)
+        pushed = (item.post
+                  for item in self.items.fetch(values, direction, limit))
+        return self.merge(pushed, pulled, direction, limit)
+
+    def fetch_keys(self, values, direction, limit):
+        pulled = []
+        if self.celebrities:
+            pulled = super().fetch_keys(values, direction, limit)
+        pushed = (
+            Post(pk=post_id, pub_date=pub_date)
+            for post_id, pub_date in self.items.window(
+                values, direction
+            ).values_list('post_id', 'pub_date')[:limit]
+        )
+        return self.merge(pushed, pulled, direction, limit)
@@ -0,0 +1,171 @@
+"""Подписки: запись и проверка «подписан ли читатель на автора».
+
+Авторы, на которых подписан пользователь, читаются одним запросом по
+индексу уникального ограничения ``(user, author)`` и кэшируются в
+кэше ``default`` множеством id, так что на страницах следующих профилей
+проверка идёт без запросов. Множество сбрасывается при подписке и
+отписке, а импорт сбрасывает его сам: ``bulk_create`` сигналов не шлёт.
+Сброс виден всем процессам только в общем кэше (``CACHE_URL``); с
+``LocMemCache`` у каждого процесса своя копия, поэтому срок её жизни
+``FOLLOWING_CACHE_TIMEOUT`` там — секунды.
+
+:func:`follow` и :func:`unfollow` меняют подписки одним запросом
+``... RETURNING`` (SQLite 3.35+ или PostgreSQL): повтор и гонка двух
+запросов не создают дублей и не падают. Сигналы по строкам не
+отправляются: :func:`followed` и :func:`unfollowed` применяют к
+изменившимся строкам счётчики, ленту, кэши и журнал графа пакетом, за
+постоянное число запросов. Обработчики сигналов ``Follow`` вызывают
+их же для подписок, сохранённых через ORM.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from users.models import Profile
+
+from . import cache as feed_cache
+from . import counters, feed, graph
+from .models import Follow, User
+
+FOLLOWING_KEY = 'following:{}'
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан ``user_id``."""
+    key = FOLLOWING_KEY.format(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        ))
+        cache.set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def is_following(user, author):
+    """Подписан ли ``user`` на ``author``; аноним — ни на кого."""
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    return author.pk in following_ids(user.pk)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([FOLLOWING_KEY.format(user_id) for user_id in user_ids])
+
+
+def _count(user, author_ids, delta):
+    counters.change(
+        Profile.objects.filter(user_id__in=author_ids), 'followers_count',
+        delta=delta
+    )
+    counters.change(
+        Profile.objects.filter(user_id=user.pk), 'following_count',
+        delta=delta * len(author_ids)
+    )
+
+
+def _invalidate(user, author_ids, usernames):
+    invalidate(user.pk)
+    feed_cache.bump(
+        feed_cache.profile_scope(user.pk),
+        *(feed_cache.profile_scope(author_id) for author_id in author_ids),
+    )
+    feed_cache.invalidate_pages(
+        ('posts:profile', user.username),
+        *(('posts:profile', username) for username in usernames),
+    )
+
+
+def followed(user, author_ids, usernames):
+    """Побочные эффекты новых подписок ``user`` на ``author_ids``.
+
+    ``usernames`` — имена авторов для сброса страниц профилей; лишние
+    имена только сбросят кэш страниц зря.
+    """
+    if not author_ids:
+        return
+    # Счётчики первыми: от числа подписчиков зависит, класть ли посты
+    # автора в ленту
+    _count(user, author_ids, 1)
+    feed.backfill(user.pk, *author_ids)
+    _invalidate(user, author_ids, usernames)
+    graph.record(graph.FOLLOW, user.pk, *author_ids)
+
+
+def unfollowed(user, author_ids, usernames):
+    """Побочные эффекты отписок ``user`` от ``author_ids``."""
+    if not author_ids:
+        return
+    _count(user, author_ids, -1)
+    feed.remove_authors(user.pk, *author_ids)
+    feed.backfill_former_celebrities(*author_ids)
+    _invalidate(user, author_ids, usernames)
+    graph.record(graph.UNFOLLOW, user.pk, *author_ids)
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def follow(user, usernames):
+    """Подписывает ``user`` на авторов ``usernames``.
+
+    Уже имеющиеся подписки, подписка на себя и неизвестные имена
+    пропускаются. Возвращает созданные подписки.
+    """
+    usernames = sorted(set(usernames))
+    if not usernames:
+        return []
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        # WHERE перед ON CONFLICT обязателен: иначе SQLite примет
+        # ON за условие соединения в SELECT
+        rows = _execute(f"""
+            INSERT INTO {quote(Follow._meta.db_table)} (user_id, author_id)
+            SELECT %s, id FROM {quote(User._meta.db_table)}
+            WHERE username IN ({_placeholders(usernames)}) AND id <> %s
+            ON CONFLICT DO NOTHING
+            RETURNING id, author_id
+        """, [user.pk, *usernames, user.pk])
+        created = [
+            Follow(pk=pk, user=user, author_id=author_id)
+            for pk, author_id in rows
+        ]
+        followed(
+            user, [instance.author_id for instance in created], usernames
+        )
+    return created
+
+
+def unfollow(user, usernames):
+    """Отписывает ``user`` от авторов ``usernames``.
+
+    Отписка от тех, на кого он не подписан, ничего не делает. Возвращает
+    удалённые подписки.
+    """
+    usernames = sorted(set(usernames))
+    if not usernames:
+        return []
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        rows = _execute(f"""
+            DELETE FROM {quote(Follow._meta.db_table)}
+            WHERE user_id = %s AND author_id IN (
+                SELECT id FROM {quote(User._meta.db_table)}
+                WHERE username IN ({_placeholders(usernames)})
+            )
+            RETURNING id, author_id
+        """, [user.pk, *usernames])
+        deleted = [
+            Follow(pk=pk, user=user, author_id=author_id)
+            for pk, author_id in rows
+        ]
+        unfollowed(
+            user, [instance.author_id for instance in deleted], usernames
+        )
+    return deleted
@@ -1,4 +1,7 @@
+from core.uploads import RejectedUpload, normalize_orientation
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
 from .models import Comment, Post
 
@@ -8,6 +11,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, которые обработчик загрузки не дочитал из-за размера
+        self.rejected = {
+            name: upload for name, upload in self.files.items()
+            if isinstance(upload, RejectedUpload)
+        }
+        if self.rejected:
+            self.files = self.files.copy()
+            for name in self.rejected:
+                del self.files[name]
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if len(data) >= 2000:
@@ -17,6 +32,23 @@ class PostForm(forms.ModelForm):
                 raise forms.ValidationError(f'Слово "{word}" слишком длинное!')
         return data
 
+    def clean_image(self):
+        upload = self.rejected.get('image')
+        if upload is not None:
+            raise forms.ValidationError(
+                f'Файл больше {filesizeformat(upload.limit)}!'
+            )
+        image = self.cleaned_data['image']
+        # Новая загрузка; у сохранённой картинки атрибута image нет
+        if not getattr(image, 'image', None):
+            return image
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                f'Изображение {width}×{height} слишком большое!'
+            )
+        return normalize_orientation(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
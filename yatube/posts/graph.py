@@ -0,0 +1,220 @@
+"""Граф подписок в памяти процесса.
+
+Для каждого пользователя хранятся отсортированные массивы id (``array``
+из ``q``) тех, на кого он подписан, и его подписчиков. По ним без SQL
+отдаются списки подписок, проверка взаимной подписки и «кого почитать»
+— авторы, на которых подписаны авторы читателя.
+
+Снимок строится из ``Follow`` один раз, а дальше догоняет базу по
+журналу изменений в общем кэше: каждая подписка и отписка после
+фиксации транзакции получает номер ``follow_graph:version`` и
+записывается под ключом ``follow_graph:change:<номер>``. Процесс,
+отставший больше чем на ``FOLLOW_GRAPH_MAX_REPLAY`` изменений или
+не нашедший записи журнала, строит снимок заново. Изменения
+применяются идемпотентно, поэтому повтор уже учтённых не вредит.
+
+Журнал виден всем процессам только в общем кэше (``CACHE_URL``); с
+``LocMemCache`` каждый процесс видит лишь свои изменения, поэтому снимок
+старше ``FOLLOW_GRAPH_MAX_AGE`` секунд тоже строится заново.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from .models import Follow, User
+
+VERSION_KEY = 'follow_graph:version'
+CHANGE_KEY = 'follow_graph:change:{}'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+EMPTY = array('q')
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+# Массивы не меняются на месте, а заменяются новыми: читатель снимка в
+# другом потоке досматривает прежний массив целиком
+def _add(index, key, value):
+    ids = index.get(key, EMPTY)
+    position = bisect_left(ids, value)
+    if position == len(ids) or ids[position] != value:
+        index[key] = ids[:position] + array('q', [value]) + ids[position:]
+
+
+def _remove(index, key, value):
+    ids = index.get(key, EMPTY)
+    position = bisect_left(ids, value)
+    if position < len(ids) and ids[position] == value:
+        if len(ids) == 1:
+            del index[key]
+        else:
+            index[key] = ids[:position] + ids[position + 1:]
+
+
+class FollowGraph:
+    """Снимок подписок: ``following`` и ``followers`` по id."""
+
+    def __init__(self, pairs=(), version=None):
+        self.version = version
+        self.loaded = time.monotonic()
+        self._popular = None
+        self.following = {}
+        self.followers = {}
+        for user_id, author_id in pairs:
+            self.following.setdefault(user_id, array('q')).append(author_id)
+            self.followers.setdefault(author_id, array('q')).append(user_id)
+        for index in (self.following, self.followers):
+            for ids in index.values():
+                ids[:] = array('q', sorted(ids))
+
+    @classmethod
+    def load(cls, version=None):
+        pairs = Follow.objects.values_list('user_id', 'author_id').iterator()
+        return cls(pairs, version)
+
+    def apply(self, op, user_id, author_id):
+        if op == FOLLOW:
+            _add(self.following, user_id, author_id)
+            _add(self.followers, author_id, user_id)
+        else:
+            _remove(self.following, user_id, author_id)
+            _remove(self.followers, author_id, user_id)
+
+    def following_of(self, user_id):
+        return self.following.get(user_id, EMPTY)
+
+    def followers_of(self, user_id):
+        return self.followers.get(user_id, EMPTY)
+
+    def follows(self, user_id, author_id):
+        return _contains(self.following_of(user_id), author_id)
+
+    def is_mutual(self, user_id, other_id):
+        return (self.follows(user_id, other_id)
+                and self.follows(other_id, user_id))
+
+    def popular(self):
+        """Самые читаемые авторы, по убыванию числа подписчиков.
+
+        Считаются один раз на снимок: журнал их не обновляет, список
+        освежается вместе со снимком.
+        """
+        if self._popular is None:
+            self._popular = heapq.nsmallest(
+                settings.FOLLOW_GRAPH_POPULAR, self.followers,
+                key=lambda author_id: (
+                    -len(self.followers[author_id]), author_id
+                ),
+            )
+        return self._popular
+
+    def suggestions(self, user_id, limit=10):
+        """Id авторов, на которых подписаны авторы ``user_id``.
+
+        Чем больше авторов читателя подписано на кандидата, тем он выше,
+        при равенстве — у кого больше подписчиков. Без подписок
+        предлагаются самые читаемые авторы.
+        """
+        following = self.following_of(user_id)
+        scores = Counter()
+        for author_id in following:
+            scores.update(self.following_of(author_id))
+        candidates = (
+            candidate for candidate in scores or self.popular()
+            if candidate != user_id and not _contains(following, candidate)
+        )
+        if not scores:
+            return list(islice(candidates, limit))
+        return heapq.nsmallest(limit, candidates, key=lambda candidate: (
+            -scores[candidate], -len(self.followers_of(candidate)), candidate
+        ))
+
+
+_graph = None
+_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Счётчик вытеснен: начало от времени больше версий всех старых
+        # снимков, и они перестроятся
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_graph():
+    """Снимок, догнавший журнал изменений в общем кэше."""
+    global _graph
+    with _lock:
+        version = _current_version()
+        graph = _graph
+        if graph is not None and (
+            time.monotonic() - graph.loaded > settings.FOLLOW_GRAPH_MAX_AGE
+        ):
+            graph = None
+        if graph is not None and graph.version == version:
+            return graph
+        behind = (version - graph.version) if graph is not None else None
+        changes = {}
+        if behind is not None and 0 < behind <= (
+            settings.FOLLOW_GRAPH_MAX_REPLAY
+        ):
+            keys = [
+                CHANGE_KEY.format(number)
+                for number in range(graph.version + 1, version + 1)
+            ]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                for key in keys:
+                    graph.apply(*changes[key])
+                graph.version = version
+                return graph
+        # Версию читаем до выборки: изменения после неё догонит журнал
+        _graph = FollowGraph.load(version)
+        return _graph
+
+
+def _record(op, user_id, author_ids):
+    try:
+        version = cache.incr(VERSION_KEY, len(author_ids))
+    except ValueError:
+        _current_version()
+        version = cache.incr(VERSION_KEY, len(author_ids))
+    first = version - len(author_ids) + 1
+    cache.set_many({
+        CHANGE_KEY.format(first + offset): (op, user_id, author_id)
+        for offset, author_id in enumerate(author_ids)
+    }, settings.FOLLOW_GRAPH_CHANGE_TIMEOUT)
+
+
+def record(op, user_id, *author_ids):
+    """Записывает изменения в журнал после фиксации транзакции."""
+    if author_ids:
+        transaction.on_commit(lambda: _record(op, user_id, author_ids))
+
+
+def reset():
+    """Перестроить снимки всех процессов: подписки менялись без сигналов."""
+    cache.set(VERSION_KEY, _current_version() + 1, None)
+
+
+def users_page(ids, number, per_page):
+    """Страница пользователей из списка id в его порядке."""
+    page = Paginator(ids, per_page).get_page(number)
+    users = User.objects.select_related('profile').in_bulk(list(page))
+    page.object_list = [users[pk] for pk in page if pk in users]
+    return page
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import FeedItem, Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованные ленты подписок по таблице Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='users', action='append', default=[],
+            help='Имя пользователя; можно указать несколько раз',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Сначала удалить существующие записи лент',
+        )
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.all()
+        items = FeedItem.objects.all()
+        if options['users']:
+            follows = follows.filter(user__username__in=options['users'])
+            items = items.filter(user__username__in=options['users'])
+        if options['clear']:
+            items.delete()
+        pairs = follows.values_list('user_id', 'author_id').distinct()
+        count = 0
+        for user_id, author_id in pairs.iterator():
+            feed.backfill(user_id, author_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Подписок обработано: {count}, '
+            f'записей в лентах: {FeedItem.objects.count()}'
+        ))
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import PendingImage, Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок постов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересоздать копии для всех картинок',
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='работать фоновым процессом, проверяя очередь постоянно',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='пауза между проверками очереди в секундах',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='сколько картинок обрабатывать параллельно',
+        )
+
+    def handle(self, *args, **options):
+        # Картинки, которые не удалось обработать, не берутся повторно
+        self.failed = set()
+        pool = None
+        if options['workers'] > 1:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+        try:
+            built = self.build(pool, self.missing(options['all']))
+            while options['watch']:
+                time.sleep(options['interval'])
+                # Дальше только очередь: полный обход постов был выше
+                built += self.build(
+                    pool, PendingImage.objects.values_list('post', 'image')
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {built}'
+        ))
+
+    def missing(self, rebuild):
+        """Все картинки без копий, включая не попавшие в очередь."""
+        posts = Post.objects.exclude(image='')
+        if not rebuild:
+            posts = posts.filter(image_variants__isnull=True)
+        return posts.values_list('pk', 'image')
+
+    def build(self, pool, candidates):
+        jobs = [job for job in candidates if job not in self.failed]
+        if pool is None:
+            results = [thumbnails.generate(*job) for job in jobs]
+        else:
+            results = pool.map(lambda job: thumbnails.run_job(*job), jobs)
+        built = 0
+        for job, ok in zip(jobs, results):
+            if ok:
+                built += 1
+            else:
+                self.failed.add(job)
+        return built
@@ -0,0 +1,78 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает пользователей, группы, посты, комментарии и подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+            help='ndjson — один поток, csv — по файлу на таблицу',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='файл NDJSON или каталог для CSV; «-» — stdout',
+        )
+        parser.add_argument(
+            '--table', dest='tables', action='append',
+            choices=transfer.TABLE_NAMES,
+            help='таблица для выгрузки; можно указать несколько раз',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tables = [name for name in transfer.TABLE_NAMES
+                  if name in (options['tables'] or transfer.TABLE_NAMES)]
+        output = options['output']
+        if options['format'] == 'csv':
+            if output == '-':
+                raise CommandError('Для CSV укажите каталог в --output')
+            os.makedirs(output, exist_ok=True)
+            for name in tables:
+                path = os.path.join(output, f'{name}.csv')
+                with open(path, 'w', newline='') as stream:
+                    self.export(name, options, self.csv_writer(name, stream))
+            return
+        if output == '-':
+            write = self.stdout.write
+            for name in tables:
+                self.export(name, options, self.ndjson_writer(name, write))
+            return
+        with open(output, 'w') as stream:
+            for name in tables:
+                self.export(
+                    name, options, self.ndjson_writer(name, stream.write)
+                )
+
+    def csv_writer(self, name, stream):
+        _, _, columns, _ = transfer.TABLES[transfer.TABLE_NAMES.index(name)]
+        writer = csv.DictWriter(stream, columns)
+        writer.writeheader()
+        return writer.writerow
+
+    def ndjson_writer(self, name, write):
+        def write_row(row):
+            write(json.dumps(
+                {'model': name, **row},
+                cls=transfer.JSONEncoder, ensure_ascii=False,
+            ) + '\n')
+        return write_row
+
+    def export(self, name, options, write_row):
+        started = time.perf_counter()
+        count = 0
+        for row in transfer.export_rows(name, options['batch_size']):
+            write_row(row)
+            count += 1
+        elapsed = time.perf_counter() - started
+        # stdout может быть занят самими данными
+        self.stderr.write(
+            f'{name}: {count} строк, {count / max(elapsed, 1e-9):.0f} строк/с'
+        )
@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_data и заново строит счётчики, '
+        'ленты и поисковый индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='файл NDJSON («-» — stdin) или каталог с CSV',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='не перестраивать счётчики, ленты и поиск',
+        )
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(options['batch_size'])
+        started = time.perf_counter()
+        if os.path.isdir(options['source']):
+            rows = self.read_csv(options['source'])
+        else:
+            rows = self.read_ndjson(options['source'])
+        for name, row in rows:
+            importer.add(name, row)
+        importer.flush()
+        elapsed = time.perf_counter() - started
+        total = sum(importer.loaded.values())
+        for name in transfer.TABLE_NAMES:
+            self.stdout.write(
+                f'{name}: {importer.loaded[name]} строк, '
+                f'пропущено {importer.skipped[name]}'
+            )
+        self.stdout.write(
+            f'Загружено {total} строк за {elapsed:.1f} с, '
+            f'{total / max(elapsed, 1e-9):.0f} строк/с'
+        )
+        if not options['skip_derived']:
+            elapsed = transfer.rebuild_derived()
+            self.stdout.write(f'Производные данные построены за '
+                              f'{elapsed:.1f} с')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def read_ndjson(self, source):
+        stream = sys.stdin if source == '-' else open(source)
+        try:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    name = row.pop('model')
+                except (ValueError, KeyError, AttributeError):
+                    raise CommandError(f'Строка {number}: не запись выгрузки')
+                if name not in transfer.TABLE_NAMES:
+                    raise CommandError(
+                        f'Строка {number}: неизвестная таблица {name!r}'
+                    )
+                yield name, row
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def read_csv(self, directory):
+        for name in transfer.TABLE_NAMES:
+            path = os.path.join(directory, f'{name}.csv')
+            if not os.path.exists(path):
+                continue
+            with open(path, newline='') as stream:
+                for row in csv.DictReader(stream):
+                    yield name, row
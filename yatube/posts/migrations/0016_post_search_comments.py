@@ -0,0 +1,74 @@
+import core.fields
+from django.db import migrations
+
+from ._analysis_0016 import analyze
+
+BATCH_SIZE = 1000
+
+
+def analyzed(texts):
+    return ' '.join(term for text in texts for term in analyze(text))
+
+
+def rebuild_search_table(apps, schema_editor):
+    """Пересоздаёт таблицу FTS5 с колонкой комментариев и основами слов.
+
+    Посты читаются пачками по id, комментарии — для каждой пачки.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    schema_editor.execute('DROP TABLE posts_post_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_search USING fts5(text, comments)'
+    )
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    last = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last)[:BATCH_SIZE])
+        if not batch:
+            break
+        last = batch[-1][0]
+        comments = {}
+        for post_id, text in Comment.objects.filter(
+            post_id__in=[pk for pk, _ in batch]
+        ).values_list('post_id', 'text').iterator():
+            comments.setdefault(post_id, []).append(text)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_post_search (rowid, text, comments) '
+                'VALUES (%s, %s, %s)',
+                [(pk, analyzed([text]), analyzed(comments.get(pk, ())))
+                 for pk, text in batch],
+            )
+
+
+def restore_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_post_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_search USING fts5(text)'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_search (rowid, text) '
+        'SELECT id, text FROM posts_post'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postsearch',
+            name='comments',
+            field=core.fields.FullTextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(rebuild_search_table, restore_search_table),
+    ]
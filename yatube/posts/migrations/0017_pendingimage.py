@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_search_comments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingImage',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pending_image', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('image', models.CharField(max_length=100, verbose_name='Картинка')),
+            ],
+        ),
+    ]
@@ -0,0 +1,145 @@
+"""Копия ``posts.analysis`` на момент миграции 0016.
+
+Миграция заполняет индекс основами слов и не должна зависеть от
+будущих правок анализатора; модули с «_» загрузчик миграций
+пропускает. Не менять.
+"""
+import re
+from functools import lru_cache
+
+WORD_RE = re.compile(r'\w+')
+VOWELS = frozenset('аеиоуыэюя')
+
+# Стоп-слова из списка Snowball для русского языка
+STOP_WORDS = frozenset('''
+    а без более больше будет будто бы был была были было быть в вам вас
+    вдруг ведь во вот впрочем все всегда всего всех всю вы где да даже два
+    для до другой его ее ей ему если есть еще ж же за зачем здесь и из или
+    им иногда их к как какая какой когда конечно кто куда ли лучше между
+    меня мне много может можно мой моя мы на над надо наконец нас не него
+    нее ней нельзя нет ни нибудь никогда ним них ничего но ну о об один он
+    она они опять от перед по под после потом потому почти при про раз
+    разве с сам свою себе себя сейчас со совсем так такой там тебя тем
+    теперь то тогда того тоже только том тот три тут ты у уж уже хорошо
+    хоть чего чем через что чтоб чтобы чуть эти этого этой этом этот эту я
+'''.split())
+
+
+def _endings(after_a='', other=''):
+    """Окончания по убыванию длины и те, что идут только после «а»/«я»."""
+    after_a = frozenset(after_a.split())
+    suffixes = sorted(after_a | set(other.split()), key=len, reverse=True)
+    return tuple(suffixes), after_a
+
+
+PERFECTIVE_GERUND = _endings('в вши вшись', 'ив ивши ившись ыв ывши ывшись')
+ADJECTIVE = _endings(other=(
+    'ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую '
+    'юю ая яя ою ею'
+))
+PARTICIPLE = _endings('ем нн вш ющ щ', 'ивш ывш ующ')
+REFLEXIVE = _endings(other='ся сь')
+VERB = _endings(
+    'ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно',
+    'ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят '
+    'ует уют ит ыт ены ить ыть ишь ую ю',
+)
+NOUN = _endings(other=(
+    'а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам '
+    'ом о у ах иях ях ы ь ию ью ю ия ья я'
+))
+SUPERLATIVE = _endings(other='ейш ейше')
+DERIVATIONAL = _endings(other='ост ость')
+
+
+def _regions(word):
+    """Начала областей RV, R1 и R2 в терминах Snowball."""
+    rv = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS),
+        len(word),
+    )
+    r1 = r2 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r1, r2
+
+
+def _remove(word, start, endings):
+    """Отрезает самое длинное из окончаний, лежащее после ``start``.
+
+    Возвращает None, если окончания нет или оно не прошло проверку на
+    «а»/«я» перед ним: более короткие окончания тогда не пробуются.
+    """
+    suffixes, after_a = endings
+    for suffix in suffixes:
+        cut = len(word) - len(suffix)
+        if cut < start or not word.endswith(suffix):
+            continue
+        if suffix in after_a and (cut - 1 < start
+                                  or word[cut - 1] not in 'ая'):
+            return None
+        return word[:cut]
+    return None
+
+
+def _step1(word, rv):
+    """Окончания деепричастий, прилагательных, глаголов и существительных."""
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is not None:
+        return result
+    unreflexive = _remove(word, rv, REFLEXIVE)
+    if unreflexive is not None:
+        word = unreflexive
+    result = _remove(word, rv, ADJECTIVE)
+    if result is not None:
+        participle = _remove(result, rv, PARTICIPLE)
+        return result if participle is None else participle
+    for endings in (VERB, NOUN):
+        result = _remove(word, rv, endings)
+        if result is not None:
+            return result
+    return word
+
+
+def _step4(word, rv):
+    """Превосходная степень, двойное «н» и мягкий знак."""
+    result = _remove(word, rv, SUPERLATIVE)
+    if result is not None:
+        word = result
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    if result is None and word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка.
+
+    Словарь текстов невелик, поэтому основы кэшируются.
+    """
+    word = word.lower().replace('ё', 'е')
+    rv, _, r2 = _regions(word)
+    word = _step1(word, rv)
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    result = _remove(word, r2, DERIVATIONAL)
+    if result is not None:
+        word = result
+    return _step4(word, rv)
+
+
+def analyze(text):
+    """Основы значимых слов текста в порядке их появления."""
+    terms = []
+    for word in WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if word not in STOP_WORDS:
+            terms.append(stem(word))
+    return terms
@@ -1,4 +1,6 @@
+from core.fields import FullTextField
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
 
 User = get_user_model()
@@ -13,6 +15,26 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Колонки автора и группы, которые в лентах не выводятся
+    FEED_DEFERRED_FIELDS = (
+        'author__password',
+        'author__email',
+        'author__last_login',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_feed(self):
+        """Посты вместе с автором и группой одним запросом.
+
+        Варианты картинок подгружаются ещё одним запросом на страницу.
+        """
+        return self.select_related('author', 'group').defer(
+            *self.FEED_DEFERRED_FIELDS
+        ).prefetch_related('image_variants')
+
+
 class Post(models.Model):
     text = (models.TextField("Текст поста",
             help_text='Введите текст поста'))
@@ -37,10 +59,42 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Счётчики меняются только через F(), обычное сохранение их не пишет,
+    # чтобы не затереть чужие инкременты устаревшим значением
+    COUNTER_FIELDS = ('comments_count',)
+
+    class Meta:
+        # Ленты сортируются по (pub_date, id) и фильтруются по автору
+        # или группе: каждая страница читается проходом по индексу
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -64,6 +118,12 @@ class Comment(models.Model):
     )
     created = models.DateTimeField('Дата создания поста', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -79,3 +139,109 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class FeedItem(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста и при подписке на автора,
+    ``pub_date`` копируется из поста, чтобы лента читалась по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста в одном из форматов.
+
+    Создаётся в фоне после загрузки картинки; размеры хранятся, чтобы
+    выводить ``srcset`` без обращения к файлам.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост'
+    )
+    name = models.CharField('Файл', max_length=255)
+    format = models.CharField('Формат', max_length=10)
+    width = models.PositiveSmallIntegerField('Ширина')
+    height = models.PositiveSmallIntegerField('Высота')
+
+    class Meta:
+        ordering = ('width',)
+        unique_together = ('post', 'format', 'width')
+
+    def __str__(self):
+        return f'{self.name} ({self.width}x{self.height})'
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class PendingImage(models.Model):
+    """Картинка поста, для которой ждут уменьшенные копии.
+
+    Очередь для ``build_image_variants --watch``: строка появляется при
+    загрузке картинки и удаляется, когда копии сохранены.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pending_image',
+        verbose_name='Пост'
+    )
+    image = models.CharField('Картинка', max_length=100)
+
+    def __str__(self):
+        return self.image
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов (SQLite FTS5).
+
+    Таблица виртуальная и создаётся миграцией только на SQLite; её
+    ``rowid`` совпадает с id поста. Заполняется бэкендом из
+    ``posts.search`` основами слов (см. ``posts.analysis``) текста поста
+    и его комментариев.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry',
+    )
+    text = FullTextField()
+    comments = FullTextField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_search'
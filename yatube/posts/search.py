@@ -0,0 +1,179 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд задаётся настройкой ``SEARCH_BACKEND``: по умолчанию индекс
+SQLite FTS5, на Postgres — выражение ``to_tsvector`` с GIN-индексом.
+У всех бэкендов одинаковый интерфейс: ``search`` добавляет к выборке
+аннотацию ``rank`` (чем больше, тем ближе к запросу), ``filter`` только
+отбирает подходящие посты, ``index``/``remove``/``rebuild`` и
+``add_comment``/``remove_comment`` обновляют индекс.
+"""
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+from django.utils.module_loading import import_string
+
+from .analysis import WORD_RE, analyze
+from .models import Comment, Post, PostSearch
+
+
+@lru_cache(maxsize=None)
+def get_backend(path=None):
+    return import_string(path or settings.SEARCH_BACKEND)()
+
+
+class SQLiteSearchBackend:
+    """Индекс в виртуальной таблице FTS5, ранжирование по bm25.
+
+    В таблицу пишутся основы слов поста и его комментариев, а запрос
+    разбирается тем же конвейером ``analyze``. Правка поста меняет
+    только колонку ``text``, а комментарий дописывает или вычитает свои
+    основы в ``comments``: остальные комментарии заново не читаются.
+    """
+    batch_size = 1000
+    # Веса колонок text и comments для bm25
+    weights = (1.0, 0.3)
+
+    def entry(self, post_id, text, comments):
+        return PostSearch(
+            post_id=post_id,
+            text=' '.join(analyze(text)),
+            comments=' '.join(
+                term for comment in comments for term in analyze(comment)
+            ),
+        )
+
+    def index(self, post):
+        text = ' '.join(analyze(post.text))
+        if PostSearch.objects.filter(post_id=post.pk).update(text=text):
+            return
+        comments = Comment.objects.filter(post_id=post.pk).values_list(
+            'text', flat=True
+        )
+        self.entry(post.pk, post.text, comments).save(force_insert=True)
+
+    def add_comment(self, comment):
+        terms = analyze(comment.text)
+        if terms:
+            PostSearch.objects.filter(post_id=comment.post_id).update(
+                comments=Concat(
+                    F('comments'), Value(' ' + ' '.join(terms)),
+                    output_field=PostSearch._meta.get_field('comments'),
+                )
+            )
+
+    def remove_comment(self, comment, text=None):
+        """Вычитает основы ``text``, по умолчанию — текста комментария."""
+        terms = Counter(analyze(comment.text if text is None else text))
+        if not terms:
+            return
+        entries = PostSearch.objects.filter(post_id=comment.post_id)
+        with transaction.atomic():
+            current = entries.values_list('comments', flat=True).first()
+            if current is None:
+                return
+            kept = []
+            for term in current.split():
+                if terms[term] > 0:
+                    terms[term] -= 1
+                else:
+                    kept.append(term)
+            entries.update(comments=' '.join(kept))
+
+    def remove(self, post_id):
+        PostSearch.objects.filter(post_id=post_id).delete()
+
+    def rebuild(self):
+        PostSearch.objects.all().delete()
+        posts = Post.objects.order_by('pk').values_list('pk', 'text')
+        last = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last)[:self.batch_size])
+            if not batch:
+                break
+            last = batch[-1][0]
+            comments = {}
+            rows = Comment.objects.filter(
+                post_id__in=[pk for pk, _ in batch]
+            ).values_list('post_id', 'text')
+            for post_id, text in rows:
+                comments.setdefault(post_id, []).append(text)
+            PostSearch.objects.bulk_create(
+                self.entry(pk, text, comments.get(pk, ()))
+                for pk, text in batch
+            )
+
+    def match_expression(self, query):
+        # Каждая основа берётся в кавычки, чтобы ввод пользователя
+        # не читался как синтаксис FTS5; основы соединяются через AND
+        return ' '.join(f'"{term}"' for term in analyze(query))
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        return queryset.filter(search_entry__text__match=expression)
+
+    def search(self, queryset, query):
+        rank = RawSQL(
+            f'-bm25({PostSearch._meta.db_table}, %s, %s)', self.weights,
+            output_field=FloatField(),
+        )
+        return self.filter(queryset, query).annotate(rank=rank)
+
+
+class PostgresSearchBackend:
+    """Поиск по ``to_tsvector`` текста поста.
+
+    Индекс — выражение GIN из миграции, Postgres обновляет его сам,
+    поэтому ``index``/``remove``/``rebuild`` ничего не делают. Стеммер
+    Snowball и стоп-слова даёт встроенная конфигурация ``russian``;
+    комментарии в этом бэкенде не ищутся.
+    """
+    config = 'russian'
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def add_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment, text=None):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def words(self, query):
+        return WORD_RE.findall(query)
+
+    def _vector_and_query(self, query):
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+        return (
+            SearchVector('text', config=self.config),
+            SearchQuery(' '.join(self.words(query)), config=self.config),
+        )
+
+    def filter(self, queryset, query):
+        if not self.words(query):
+            return queryset.none()
+        vector, search_query = self._vector_and_query(query)
+        return queryset.annotate(search_vector=vector).filter(
+            search_vector=search_query
+        )
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchRank
+        if not self.words(query):
+            return queryset.none()
+        vector, search_query = self._vector_and_query(query)
+        return self.filter(queryset, query).annotate(
+            rank=SearchRank(vector, search_query)
+        )
@@ -0,0 +1,176 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from users.models import Profile
+
+from . import cache, counters, feed, follows, search
+from .models import Comment, Follow, Group, Post, User
+
+
+# Счётчики обновляются первыми: от числа подписчиков зависит fan-out
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(
+            Profile.objects.filter(user_id=instance.author_id), 'posts_count'
+        )
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change(
+        Profile.objects.filter(user_id=instance.author_id), 'posts_count',
+        delta=-1
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(
+            Post.objects.filter(pk=instance.post_id), 'comments_count'
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', delta=-1
+    )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+# Подписки через ORM: пакетные follow() и unfollow() сигналов не шлют
+# и вызывают те же функции сами
+@receiver(post_save, sender=Follow)
+def apply_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows.followed(
+            instance.user, [instance.author_id], [instance.author.username]
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def apply_unfollow(sender, instance, **kwargs):
+    follows.unfollowed(
+        instance.user, [instance.author_id], [instance.author.username]
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+def _comment_post(comment):
+    """Пост комментария или None, если комментарий удаляется вместе
+    с постом (например, при удалении пользователя)."""
+    if comment.post_id is None:
+        return None
+    try:
+        return comment.post
+    except Post.DoesNotExist:
+        return None
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_text(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний текст, чтобы вычесть его основы из индекса."""
+    instance._previous_text = None
+    if instance.pk and not raw:
+        instance._previous_text = Comment.objects.filter(
+            pk=instance.pk
+        ).values_list('text', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    backend = search.get_backend()
+    previous = getattr(instance, '_previous_text', None)
+    if created or previous is None:
+        backend.add_comment(instance)
+    elif previous != instance.text:
+        backend.remove_comment(instance, previous)
+        backend.add_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.get_backend().remove_comment(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю группу, чтобы сбросить и её ленту."""
+    instance._previous_group_id = None
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    cache.bump_post(instance, getattr(instance, '_previous_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_feeds(sender, instance, **kwargs):
+    cache.bump_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    post = _comment_post(instance)
+    if post is not None:
+        cache.bump_post(post)
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний адрес группы, чтобы сбросить и его страницы."""
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    authors = list(Post.objects.filter(group=instance).values_list(
+        'author_id', 'author__username'
+    ).distinct())
+    cache.bump(
+        cache.INDEX,
+        cache.group_scope(instance.pk),
+        *(cache.author_scope(author_id) for author_id, _ in authors),
+    )
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    cache.invalidate_pages(
+        ('posts:index',),
+        *(('posts:group_list', slug) for slug in slugs if slug),
+        *(('posts:profile', username) for _, username in authors),
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.invalidate_pages(('posts:profile', instance.username))
@@ -0,0 +1,57 @@
+from django import template
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+
+from posts import cache, thumbnails
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, scope):
+        self.nodelist = nodelist
+        self.scope = scope
+
+    def render(self, context):
+        scope = ':'.join(str(part.resolve(context)) for part in self.scope)
+        request = context.get('request')
+        cursor = request.GET.get('cursor', '') if request else ''
+        cache_key = make_template_fragment_key(
+            'feed', [scope, cursor, cache.get_version(scope)]
+        )
+        fragment_cache = cache.get_cache()
+        value = fragment_cache.get(cache_key)
+        if value is not None:
+            cache.record_hit()
+            return value
+        cache.record_miss()
+        value = self.nodelist.render(context)
+        if thumbnails.has_pending(request):
+            # Готовые копии могут не сбросить версию в этом процессе
+            return value
+        fragment_cache.set(cache_key, value, settings.FEED_CACHE_TIMEOUT)
+        return value
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """Кэширует страницу ленты до изменения её версии.
+
+    Использование::
+
+        {% feed_cache 'index' %} ... {% endfeed_cache %}
+        {% feed_cache 'group' group.pk %} ... {% endfeed_cache %}
+
+    Аргументы складываются в имя ленты (``group:5``), страница берётся
+    из ``?cursor=`` текущего запроса.
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'"{bits[0]}" tag requires at least one argument.'
+        )
+    return FeedCacheNode(
+        nodelist, [parser.compile_filter(bit) for bit in bits[1:]]
+    )
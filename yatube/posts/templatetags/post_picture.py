@@ -0,0 +1,19 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_picture(context, post):
+    """Копии картинки поста для ``<picture>`` или None, пока их нет.
+
+    Использование::
+
+        {% post_picture post as picture %}
+    """
+    picture = thumbnails.get_picture(post)
+    if picture is None and post.image:
+        thumbnails.mark_pending(context.get('request'))
+    return picture
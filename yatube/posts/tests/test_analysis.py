@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+from posts.analysis import analyze, stem
+
+
+class AnalysisTest(SimpleTestCase):
+    def test_stem(self):
+        '''Стеммер совпадает с эталонным словарём Snowball'''
+        # Пары из словаря https://snowballstem.org/algorithms/russian/
+        words = {
+            'авиационной': 'авиацион',
+            'абсолютно': 'абсолютн',
+            'августа': 'август',
+            'авторитетных': 'авторитетн',
+            'агентство': 'агентств',
+            'адвокатами': 'адвокат',
+            'бегущих': 'бегущ',
+            'важнейшие': 'важн',
+            'известность': 'известн',
+            'конференции': 'конференц',
+            'программирование': 'программирован',
+            'смеялся': 'смея',
+            'читавшись': 'чита',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_inflected_forms_share_stem(self):
+        '''Разные формы слова сводятся к одной основе'''
+        for forms in (('кот', 'кота', 'котами', 'котов'),
+                      ('книга', 'книги', 'книгой', 'книгу'),
+                      ('гулять', 'гуляли', 'гуляла')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(form) for form in forms}), 1)
+
+    def test_analyze(self):
+        '''Текст разбивается на слова без стоп-слов, «ё» равна «е»'''
+        self.assertEqual(
+            analyze('Ёжики и КОТЫ гуляли по крышам!'),
+            ['ежик', 'кот', 'гуля', 'крыш'],
+        )
+        self.assertEqual(analyze('и в на, а не'), [])
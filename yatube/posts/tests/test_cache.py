@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cache
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый текст для поста',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.guest_client = Client()
+        # Анонимам страница целиком отдаётся из кэша ответов, поэтому
+        # кэш фрагментов проверяется на вошедшем читателе
+        self.reader_client = Client()
+        self.reader_client.force_login(
+            User.objects.create(username='test_reader')
+        )
+
+    def test_index_is_cached_until_version_changes(self):
+        '''Главная отдаётся из кэша, пока пост не изменится'''
+        url = reverse('posts:index')
+        self.reader_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        response = self.reader_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Изменённый текст')
+
+    def test_invalidation_is_scoped(self):
+        '''Изменение поста не сбрасывает ленты чужих групп'''
+        versions = {
+            scope: cache.get_version(scope)
+            for scope in (cache.INDEX, cache.group_scope(self.group.pk),
+                          cache.group_scope(self.other_group.pk))
+        }
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        self.assertNotEqual(
+            cache.get_version(cache.INDEX), versions[cache.INDEX]
+        )
+        self.assertNotEqual(
+            cache.get_version(cache.group_scope(self.group.pk)),
+            versions[cache.group_scope(self.group.pk)]
+        )
+        self.assertEqual(
+            cache.get_version(cache.group_scope(self.other_group.pk)),
+            versions[cache.group_scope(self.other_group.pk)]
+        )
+
+    def test_moved_post_invalidates_previous_group(self):
+        '''Пост, перенесённый в другую группу, пропадает из старой'''
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertContains(self.guest_client.get(url), post.text)
+        post.group = self.other_group
+        post.save()
+        self.assertNotContains(self.guest_client.get(url), post.text)
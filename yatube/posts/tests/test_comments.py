@@ -0,0 +1,93 @@
+from http import HTTPStatus
+
+from core import response_cache
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Post
+from posts.views import NUMBER_OF_COMMENTS
+
+User = get_user_model()
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = []
+        for i in range(NUMBER_OF_COMMENTS + 5):
+            author = User.objects.create(username=f'reader_{i}')
+            cls.comments.append(Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}'
+            ))
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.guest_client = Client()
+
+    def detail_url(self):
+        return reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def comments_url(self):
+        return reverse('posts:comments', kwargs={'post_id': self.post.pk})
+
+    def test_first_page_ordered_and_bounded(self):
+        '''На странице поста первые комментарии по порядку и без N+1'''
+        with self.assertNumQueries(4):
+            response = self.guest_client.get(self.detail_url())
+        page = response.context['comments']
+        self.assertEqual(
+            list(page), self.comments[:NUMBER_OF_COMMENTS]
+        )
+        self.assertContains(response, 'Показать ещё')
+        self.assertContains(
+            response, f'{self.comments_url()}?cursor={page.next_cursor}'
+        )
+
+    def test_load_more_fragment(self):
+        '''Кнопка «Показать ещё» получает следующие комментарии фрагментом'''
+        cursor = self.guest_client.get(
+            self.detail_url()
+        ).context['comments'].next_cursor
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(
+                self.comments_url(), {'cursor': cursor}
+            )
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[NUMBER_OF_COMMENTS:],
+        )
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_load_more_json(self):
+        '''С format=json комментарии отдаются в JSON'''
+        response = self.guest_client.get(
+            self.comments_url(), {'format': 'json'}
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), NUMBER_OF_COMMENTS)
+        first = self.comments[0]
+        self.assertEqual(data['comments'][0], {
+            'id': first.pk,
+            'author': first.author.username,
+            'text': first.text,
+            'created': first.created.isoformat(),
+        })
+        data = self.guest_client.get(self.comments_url(), {
+            'format': 'json', 'cursor': data['next_cursor'],
+        }).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [comment.pk for comment in self.comments[NUMBER_OF_COMMENTS:]],
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_missing_post(self):
+        '''Для несуществующего поста комментарии не отдаются'''
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,122 @@
+from http import HTTPStatus
+from itertools import product
+
+from core import response_cache
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.reader = User.objects.create(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        response_cache.get_cache().clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_not_modified(self):
+        '''Неизменившаяся страница отдаётся как 304 без рендеринга'''
+        # Вошедшему — сессия, пользователь и валидаторы; аноним получает
+        # 304 из кэша ответов
+        clients = ((self.reader_client, 3), (self.guest_client, 0))
+        for (client, queries), url in product(clients, self.urls()):
+            with self.subTest(url=url, queries=queries):
+                response = client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(queries):
+                    response = client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                response = client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_changes_update_etag(self):
+        '''Правка поста, комментарий и подписка меняют ETag'''
+        profile_url = reverse('posts:profile', kwargs={'username': self.user})
+        changes = (
+            (lambda: Post.objects.get(pk=self.post.pk).save(), self.urls()),
+            (lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ), self.urls()),
+            (lambda: Follow.objects.create(
+                user=self.reader, author=self.user
+            ), [profile_url]),
+        )
+        for change, urls in changes:
+            etags = [self.guest_client.get(url)['ETag'] for url in urls]
+            change()
+            for url, etag in zip(urls, etags):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_cache_control(self):
+        '''Анонимам ответ публичный, вошедшим — только для браузера'''
+        url = reverse('posts:index')
+        guest = self.guest_client.get(url)
+        reader = self.reader_client.get(url)
+        self.assertIn('public', guest['Cache-Control'])
+        self.assertIn('s-maxage=', guest['Cache-Control'])
+        self.assertIn('private', reader['Cache-Control'])
+        self.assertNotEqual(guest['ETag'], reader['ETag'])
+
+    def test_missing_page(self):
+        '''Для несуществующей страницы валидаторов нет'''
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_relogin_gets_fresh_form(self):
+        '''После нового входа страница с формой не отдаётся как 304'''
+        self.reader.set_password('password')
+        self.reader.save()
+        client = Client()
+        client.login(username=self.reader.username, password='password')
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = client.get(url)
+        client.logout()
+        client.login(username=self.reader.username, password='password')
+        response = client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
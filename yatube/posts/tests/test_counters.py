@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post
+from users.models import Profile
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='test_author')
+        cls.reader = User.objects.create(username='test_reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_counters_follow_views(self):
+        '''Счётчики меняются вместе с постами, комментариями и подписками'''
+        self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'}
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        post.refresh_from_db()
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+
+    def test_edit_keeps_comments_count(self):
+        '''Редактирование поста не затирает счётчик комментариев'''
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Изменённый пост'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Изменённый пост')
+        self.assertEqual(post.comments_count, 5)
+
+    def test_recount_repairs_drift(self):
+        '''Команда recount исправляет разошедшиеся счётчики'''
+        Post.objects.create(author=self.author, text='Пост')
+        Profile.objects.filter(user=self.author).update(posts_count=42)
+        Profile.objects.filter(user=self.reader).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(self.profile(self.reader).posts_count, 0)
@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import feed
+from posts.models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='test_author')
+        cls.reader = User.objects.create(username='test_reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки'
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_posts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_post_fans_out(self):
+        '''Подписка заполняет ленту, новый пост попадает в неё сразу'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+
+    def test_unfollow_clears_feed(self):
+        '''Отписка убирает посты автора из ленты'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_posts_are_pulled(self):
+        '''Посты «знаменитостей» не раскладываются, но видны в ленте'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedItem.objects.exists())
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_former_celebrity_posts_stay_in_feed(self):
+        '''Посты автора, опустившегося до порога, раскладываются в ленты'''
+        fan = User.objects.create(username='fan')
+        fan_follow = Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        items = FeedItem.objects.filter(user=self.reader)
+        self.assertFalse(items.exists())
+        fan_follow.delete()
+        self.assertEqual(
+            set(items.values_list('post', flat=True)),
+            {new_post.pk, self.old_post.pk},
+        )
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+
+    def test_backfill_command(self):
+        '''Команда backfill_feeds восстанавливает ленты'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('backfill_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_posts(), [self.old_post])
+
+    @override_settings(FEED_BACKFILL_LIMIT=2, FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_rebuild_matches_backfill(self):
+        '''feed.rebuild заполняет ленты так же, как backfill_feeds'''
+        celebrity = User.objects.create(username='celebrity')
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            Post.objects.create(author=celebrity, text=f'Пост {i}')
+        fan = User.objects.create(username='fan')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        Follow.objects.create(user=fan, author=celebrity)
+        FeedItem.objects.all().delete()
+        call_command('backfill_feeds', stdout=StringIO())
+        expected = set(FeedItem.objects.values_list('user', 'post'))
+        feed.rebuild()
+        self.assertEqual(
+            set(FeedItem.objects.values_list('user', 'post')), expected
+        )
+        self.assertEqual(len(expected), 2)
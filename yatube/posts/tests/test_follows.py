@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import follows
+from posts.models import FeedItem, Follow, Post
+from users.models import Profile
+
+User = get_user_model()
+
+
+class FollowsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='test_reader')
+        cls.authors = [
+            User.objects.create(username=f'author_{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_follow_is_idempotent(self):
+        '''Повторная подписка и отписка ничего не ломают и не двоят'''
+        url = reverse('posts:profile_follow', kwargs={'username': 'author_0'})
+        for _ in range(2):
+            response = self.reader_client.get(url)
+            self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.authors[0]).followers_count, 1
+        )
+        url = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author_0'}
+        )
+        for _ in range(2):
+            response = self.reader_client.get(url)
+            self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(Follow.objects.count(), 0)
+        self.assertEqual(
+            Profile.objects.get(user=self.authors[0]).followers_count, 0
+        )
+
+    def test_unknown_author(self):
+        '''Подписка на несуществующего автора — 404'''
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                response = self.reader_client.get(
+                    reverse(name, kwargs={'username': 'nobody'})
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_batch(self):
+        '''Пакет подписок — один запрос, лишние имена пропускаются'''
+        names = ['author_0', 'author_1', 'nobody', 'test_reader']
+        created = follows.follow(self.reader, names)
+        self.assertEqual(
+            sorted(follow.author_id for follow in created),
+            [self.authors[0].pk, self.authors[1].pk],
+        )
+        self.assertEqual(follows.follow(self.reader, names), [])
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(
+            follows.following_ids(self.reader.pk),
+            {self.authors[0].pk, self.authors[1].pk},
+        )
+        deleted = follows.unfollow(self.reader, ['author_1', 'author_2'])
+        self.assertEqual(
+            [follow.author_id for follow in deleted], [self.authors[1].pk]
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertEqual(
+            follows.following_ids(self.reader.pk), {self.authors[0].pk}
+        )
+
+    def test_batch_queries_constant(self):
+        '''Побочные эффекты пакета — постоянное число запросов'''
+        authors = [
+            User.objects.create(username=f'batch_{i}') for i in range(50)
+        ]
+        for author in authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        names = [author.username for author in authors]
+        # Отписка ещё проверяет, не опустился ли автор до порога fan-out
+        for change, queries in ((follows.follow, 4), (follows.unfollow, 5)):
+            with self.subTest(change=change.__name__):
+                with CaptureQueriesContext(connection) as context:
+                    self.assertEqual(len(change(self.reader, names)), 50)
+                statements = [
+                    query['sql'] for query in context.captured_queries
+                    if 'SAVEPOINT' not in query['sql']
+                ]
+                self.assertEqual(len(statements), queries)
+        follows.follow(self.reader, names)
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).following_count, 50
+        )
+        self.assertEqual(
+            Profile.objects.get(user=authors[0]).followers_count, 1
+        )
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 50
+        )
+        self.assertEqual(
+            len(follows.following_ids(self.reader.pk)), 50
+        )
+
+    def test_single_statement(self):
+        '''Повтор подписки и отписка без подписки — по одному запросу'''
+        follows.follow(self.reader, ['author_0'])
+        with CaptureQueriesContext(connection) as context:
+            follows.follow(self.reader, ['author_0'])
+            follows.unfollow(self.reader, ['author_1'])
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(Follow.objects.count(), 1)
@@ -1,12 +1,25 @@
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
+from core.uploads import (EXIF_ORIENTATION, RejectedUpload,
+                          SizeLimitUploadHandler)
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from PIL.ImageFile import ImageFile
 from posts.models import Group, Post
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class TestForms(TestCase):
     def setUp(self):
@@ -61,3 +74,100 @@ class TestForms(TestCase):
         self.post.refresh_from_db()
         self.assertTrue(Post.objects.filter(text='Измененный текст').exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadFormTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def make_image(name, size=(40, 20), image_format='PNG', **params):
+        buffer = BytesIO()
+        Image.new('RGB', size, (255, 0, 0)).save(
+            buffer, image_format, **params
+        )
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def create_post(self, image):
+        return self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой', 'image': image,
+        })
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=64)
+    def test_oversized_upload_rejected(self):
+        '''Файл больше FILE_UPLOAD_MAX_SIZE отклоняется формой'''
+        response = self.create_post(self.make_image('big.png'))
+        self.assertFormError(
+            response, 'form', 'image', f'Файл больше {filesizeformat(64)}!'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=64)
+    def test_oversized_upload_in_admin(self):
+        '''Админка отклоняет слишком большой файл как ошибку формы'''
+        admin = User.objects.create_superuser('admin', 'a@b.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:posts_post_add'), data={
+            'text': 'Пост с картинкой', 'author': admin.pk,
+            'image': self.make_image('big.png'),
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['adminform'].form.errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_stops_passing_data(self):
+        '''Обработчик загрузки не передаёт дальше данные сверх предела'''
+        handler = SizeLimitUploadHandler()
+        with override_settings(FILE_UPLOAD_MAX_SIZE=10):
+            handler.new_file('image', 'big.png', 'image/png', None)
+        self.assertEqual(handler.receive_data_chunk(b'x' * 8, 0), b'x' * 8)
+        self.assertIsNone(handler.receive_data_chunk(b'x' * 8, 8))
+        self.assertIsNone(handler.receive_data_chunk(b'x' * 8, 16))
+        rejected = handler.file_complete(24)
+        self.assertIsInstance(rejected, RejectedUpload)
+        self.assertEqual(rejected.received, 24)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        '''Картинка с лишними пикселями отклоняется до декодирования'''
+        upload = self.make_image('wide.png')
+        with mock.patch.object(ImageFile, 'load') as load:
+            response = self.create_post(upload)
+        load.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image', 'Изображение 40×20 слишком большое!'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_exif_orientation_normalized(self):
+        '''Картинка поворачивается по EXIF и теряет тег Orientation'''
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        self.create_post(self.make_image(
+            'photo.jpg', image_format='JPEG', exif=exif.tobytes()
+        ))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+
+    def test_upright_image_kept_as_is(self):
+        '''Картинка без поворота сохраняется без перекодирования'''
+        upload = self.make_image('plain.png')
+        content = upload.read()
+        upload.seek(0)
+        self.create_post(upload)
+        with Post.objects.get().image.open() as image:
+            self.assertEqual(image.read(), content)
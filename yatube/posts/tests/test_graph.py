@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import follows, graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create(username=f'user_{i}')
+                     for i in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        graph._graph = None
+        patch = mock.patch.object(
+            graph.transaction, 'on_commit', lambda func: func()
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def follow(self, user, *authors):
+        follows.follow(user, [author.username for author in authors])
+
+    def test_suggestions(self):
+        '''Предлагаются авторы, на которых подписаны авторы читателя'''
+        reader, first, second, third, fourth = self.users
+        self.follow(reader, first, second)
+        self.follow(first, second, third, fourth)
+        self.follow(second, third, reader)
+        snapshot = graph.get_graph()
+        self.assertEqual(
+            snapshot.suggestions(reader.pk), [third.pk, fourth.pk]
+        )
+        self.assertTrue(snapshot.is_mutual(reader.pk, second.pk))
+        self.assertFalse(snapshot.is_mutual(reader.pk, first.pk))
+        # Без подписок — самые читаемые авторы
+        self.assertEqual(
+            snapshot.suggestions(fourth.pk, limit=2), [second.pk, third.pk]
+        )
+
+    def test_snapshot_replays_changes(self):
+        '''Снимок догоняет подписки и отписки без новой выборки'''
+        reader, first, second = self.users[:3]
+        self.follow(reader, first)
+        snapshot = graph.get_graph()
+        self.follow(reader, second)
+        follows.unfollow(reader, [first.username])
+        with self.assertNumQueries(0):
+            self.assertIs(graph.get_graph(), snapshot)
+        self.assertEqual(list(snapshot.following_of(reader.pk)), [second.pk])
+        self.assertEqual(list(snapshot.followers_of(first.pk)), [])
+
+    def test_rebuild_on_lost_journal(self):
+        '''Без записи журнала или после сброса снимок строится заново'''
+        reader, first = self.users[:2]
+        snapshot = graph.get_graph()
+        Follow.objects.bulk_create([Follow(user=reader, author=first)])
+        graph.reset()
+        rebuilt = graph.get_graph()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertTrue(rebuilt.follows(reader.pk, first.pk))
+
+    def test_rebuild_when_too_old(self):
+        '''Снимок старше FOLLOW_GRAPH_MAX_AGE строится заново'''
+        reader, first = self.users[:2]
+        snapshot = graph.get_graph()
+        # Подписка в другом процессе, чей журнал сюда не дошёл
+        Follow.objects.bulk_create([Follow(user=reader, author=first)])
+        self.assertIs(graph.get_graph(), snapshot)
+        with mock.patch.object(
+            graph.time, 'monotonic',
+            return_value=snapshot.loaded + settings.FOLLOW_GRAPH_MAX_AGE + 1,
+        ):
+            rebuilt = graph.get_graph()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertTrue(rebuilt.follows(reader.pk, first.pk))
+
+    def test_popular_counted_once(self):
+        '''Самые читаемые авторы считаются один раз на снимок'''
+        reader, first, second, third = self.users[:4]
+        self.follow(reader, first, second)
+        self.follow(third, second)
+        snapshot = graph.get_graph()
+        with mock.patch.object(
+            graph.heapq, 'nsmallest', wraps=graph.heapq.nsmallest
+        ) as nsmallest:
+            for _ in range(3):
+                self.assertEqual(
+                    snapshot.suggestions(first.pk), [second.pk]
+                )
+        self.assertEqual(nsmallest.call_count, 1)
+
+    def test_follow_list_pages(self):
+        '''Страницы подписчиков и подписок с отметкой взаимности'''
+        reader, first, second = self.users[:3]
+        self.follow(reader, first, second)
+        self.follow(first, reader)
+        client = Client()
+        response = client.get(
+            reverse('posts:following', kwargs={'username': reader})
+        )
+        self.assertEqual(list(response.context['page_obj']), [first, second])
+        self.assertEqual(
+            [user.mutual for user in response.context['page_obj']],
+            [True, False],
+        )
+        response = client.get(
+            reverse('posts:followers', kwargs={'username': first})
+        )
+        self.assertEqual(list(response.context['page_obj']), [reader])
+        client.force_login(reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['suggestions'], [])
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': first})
+        )
+        self.assertTrue(response.context['follows_you'])
@@ -0,0 +1,139 @@
+import base64
+import json
+
+from core import response_cache
+from core.paginator import CursorPaginator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(25)
+        )
+        # Одинаковая дата у всех постов: порядок держится на id
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walk_forward_and_back(self):
+        '''Курсоры проходят ленту вперёд и назад без пропусков'''
+        pages = [self.paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(
+            [post for page in pages for post in page], self.expected
+        )
+        back = self.paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        first = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        '''Испорченный курсор открывает первую страницу'''
+        for cursor in ('garbage', 'W10', '!!!'):
+            with self.subTest(cursor=cursor):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(list(page), self.expected[:10])
+
+    def test_tampered_cursor_returns_first_page(self):
+        '''Подделанный ключ в курсоре открывает первую страницу'''
+        for values in (['notadate', 'x'], ['2020-01-01', 10 ** 30]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([values, 'n', 2]).encode()
+            ).decode()
+            with self.subTest(values=values):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(list(page), self.expected[:10])
+                response = Client().get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_deep_page_without_count(self):
+        '''Страница по курсору выбирается одним запросом без COUNT'''
+        cursor = self.paginator.get_page(None).next_cursor
+        with self.assertNumQueries(1):
+            page = self.paginator.get_page(cursor)
+        self.assertEqual(list(page), self.expected[10:20])
+
+    def test_view_uses_cursor(self):
+        '''Лента index листается по ссылке из паджинатора'''
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={cursor}')
+        response = client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected[10:20]
+        )
+
+    def test_page_window(self):
+        '''Окно: первая, соседние и последняя страницы, между ними «…»'''
+        cache.clear()
+        paginator = CursorPaginator(Post.objects.all(), 2, count_timeout=60)
+        page = paginator.get_page(None)
+        for _ in range(5):
+            page = paginator.get_page(page.next_cursor)
+        links = paginator.get_page_window(page)
+        self.assertEqual(
+            [link.number for link in links],
+            [1, None, 4, 5, 6, 7, 8, None, 13],
+        )
+        for link in links:
+            if link.number and not link.current:
+                with self.subTest(number=link.number):
+                    target = paginator.get_page(link.cursor)
+                    self.assertEqual(target.number, link.number)
+                    start = (link.number - 1) * 2
+                    self.assertEqual(
+                        list(target), self.expected[start:start + 2]
+                    )
+
+    def test_last_page_by_end_cursor(self):
+        '''Последняя страница та же, что при переходах с первой'''
+        cache.clear()
+        paginator = CursorPaginator(Post.objects.all(), 10, count_timeout=60)
+        page = paginator.get_page(paginator.end_cursor(3))
+        self.assertEqual(list(page), self.expected[20:])
+        self.assertEqual(page.number, 3)
+        self.assertFalse(page.has_next())
+        previous = paginator.get_page(page.previous_cursor)
+        self.assertEqual(list(previous), self.expected[10:20])
+        self.assertEqual(previous.number, 2)
+
+    def test_window_without_count(self):
+        '''Без числа записей последняя страница заменяется пропуском'''
+        paginator = CursorPaginator(Post.objects.all(), 2)
+        links = paginator.get_page_window(paginator.get_page(None))
+        self.assertEqual(
+            [link.number for link in links], [1, 2, 3, None]
+        )
+
+    def test_stale_next_cursor(self):
+        '''Курсор за удалёнными записями открывает конец ленты'''
+        self.addCleanup(response_cache.get_cache().clear)
+        response = Client().get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        Post.objects.filter(
+            pk__in=[post.pk for post in self.expected[10:]]
+        ).delete()
+        response = Client().get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertEqual(list(page), self.expected[:10])
+        self.assertFalse(page.has_previous())
+        self.assertFalse(page.has_next())
@@ -0,0 +1,189 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post, PostSearch
+from posts.search import get_backend
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def found(self, response):
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_index_follows_post_changes(self):
+        '''Индекс обновляется при сохранении и удалении поста'''
+        post = Post.objects.create(author=self.user, text='Первый вариант')
+        self.assertEqual(self.found(self.search('вариант')), [post.pk])
+
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertEqual(self.found(self.search('вариант')), [])
+        self.assertEqual(self.found(self.search('исправленный')), [post.pk])
+
+        post.delete()
+        self.assertFalse(PostSearch.objects.exists())
+        self.assertEqual(self.found(self.search('исправленный')), [])
+
+    def test_results_ranked(self):
+        '''Посты, где слово встречается чаще, идут выше'''
+        rare = Post.objects.create(
+            author=self.user, text='Кот и длинный рассказ о собаке и погоде'
+        )
+        often = Post.objects.create(author=self.user, text='Кот кот кот')
+        Post.objects.create(author=self.user, text='Только собака')
+        self.assertEqual(self.found(self.search('кот')), [often.pk, rare.pk])
+
+    def test_inflected_forms_found(self):
+        '''Поиск находит другие формы слов запроса'''
+        post = Post.objects.create(
+            author=self.user, text='Коты гуляли по крышам'
+        )
+        self.assertEqual(self.found(self.search('кот гуляет')), [post.pk])
+        self.assertEqual(self.found(self.search('крыша')), [post.pk])
+
+    def test_stop_words_ignored(self):
+        '''Стоп-слова не мешают поиску и не находят всё подряд'''
+        post = Post.objects.create(author=self.user, text='Кот на крыше')
+        self.assertEqual(self.found(self.search('и кот')), [post.pk])
+        self.assertEqual(self.found(self.search('на')), [])
+
+    def test_comments_indexed(self):
+        '''Пост находится по словам комментариев, но ниже'''
+        commented = Post.objects.create(author=self.user, text='Просто пост')
+        own = Post.objects.create(author=self.user, text='Пост про енотов')
+        comment = Comment.objects.create(
+            post=commented, author=self.user, text='Где еноты?'
+        )
+        self.assertEqual(
+            self.found(self.search('енот')), [own.pk, commented.pk]
+        )
+        comment.delete()
+        self.assertEqual(self.found(self.search('енот')), [own.pk])
+
+    def test_comments_indexed_incrementally(self):
+        '''Комментарий меняет индекс, не перечитывая остальные'''
+        post = Post.objects.create(author=self.user, text='Просто пост')
+        for text in ('Про енотов', 'Снова еноты', 'Кошки'):
+            Comment.objects.create(post=post, author=self.user, text=text)
+        with mock.patch.object(
+            search, 'analyze', wraps=search.analyze
+        ) as analyze:
+            comment = Comment.objects.create(
+                post=post, author=self.user, text='Собаки и еноты'
+            )
+        self.assertEqual(analyze.call_count, 1)
+
+        comment.text = 'Только лисы'
+        comment.save()
+        self.assertEqual(self.found(self.search('собака')), [])
+        self.assertEqual(self.found(self.search('лиса')), [post.pk])
+        comment.delete()
+        self.assertEqual(self.found(self.search('лиса')), [])
+        self.assertEqual(self.found(self.search('енот')), [post.pk])
+        entry = PostSearch.objects.get(post=post)
+        get_backend().rebuild()
+        self.assertEqual(
+            sorted(entry.comments.split()),
+            sorted(PostSearch.objects.get(post=post).comments.split()),
+        )
+
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.found(self.search('енот')), [post.pk])
+
+    def test_orphan_comment(self):
+        '''Комментарий удалённого поста удаляется без ошибок'''
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        post.delete()
+        Comment.objects.get(pk=comment.pk).delete()
+        self.assertFalse(PostSearch.objects.exists())
+
+    def test_all_words_required(self):
+        '''Найдены только посты со всеми словами запроса'''
+        both = Post.objects.create(author=self.user, text='Рыжий кот спит')
+        Post.objects.create(author=self.user, text='Рыжий пёс')
+        self.assertEqual(self.found(self.search('кот рыжий')), [both.pk])
+
+    def test_query_syntax_is_escaped(self):
+        '''Операторы FTS5 в запросе не ломают поиск'''
+        post = Post.objects.create(author=self.user, text='Звёзды NEAR луна')
+        for query in ('"звёзды', 'NEAR(луна', 'луна*', 'text:луна', 'OR'):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.found(self.search('"звёзды')), [post.pk])
+        response = self.search('!!!')
+        self.assertEqual(self.found(response), [])
+
+    def test_cursor_pagination(self):
+        '''Результаты листаются курсором без повторов и пропусков'''
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост номер {i}')
+            for i in range(15)
+        ]
+        response = self.search('пост')
+        first = self.found(response)
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertContains(response, 'q=%D0%BF%D0%BE%D1%81%D1%82&amp;cursor=')
+
+        response = self.search('пост', cursor=page_obj.next_cursor)
+        second = self.found(response)
+        self.assertEqual(
+            sorted(first + second), sorted(post.pk for post in posts)
+        )
+        response = self.search(
+            'пост', cursor=response.context['page_obj'].previous_cursor
+        )
+        self.assertEqual(self.found(response), first)
+
+    def test_empty_query(self):
+        '''Без запроса страница поиска открывается без результатов'''
+        response = self.guest_client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('page_obj', response.context)
+
+    def test_admin_search_uses_index(self):
+        '''Поиск в админке идёт через полнотекстовый индекс'''
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        post = Post.objects.create(author=self.user, text='Особый текст')
+        Post.objects.create(author=self.user, text='Другое')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'особый'}
+        )
+        self.assertEqual(
+            [obj.pk for obj in response.context['cl'].result_list], [post.pk]
+        )
+
+    def test_rebuild(self):
+        '''rebuild восстанавливает индекс по таблице постов'''
+        post = Post.objects.create(author=self.user, text='Потерянный пост')
+        PostSearch.objects.all().delete()
+        get_backend().rebuild()
+        self.assertEqual(self.found(self.search('потерянный')), [post.pk])
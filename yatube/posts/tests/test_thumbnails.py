@@ -0,0 +1,237 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from core import response_cache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import PendingImage, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'Изображение обрабатывается'
+
+
+class StopWatch(Exception):
+    pass
+
+
+class InlineExecutor:
+    def submit(self, func, *args):
+        func(*args)
+
+
+def make_image(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._pending.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def run_inline(self):
+        '''Выполняет фоновые задачи сразу, в текущем потоке'''
+        patches = (
+            mock.patch.object(
+                thumbnails.transaction, 'on_commit', lambda func: func()
+            ),
+            mock.patch.object(
+                thumbnails, 'get_executor', return_value=InlineExecutor()
+            ),
+            mock.patch.object(thumbnails, 'run_job', thumbnails.generate),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def build(self, post):
+        thumbnails.generate(post.pk, post.image.name)
+
+    def test_placeholder_until_variants_ready(self):
+        '''Пока копий нет, лента показывает заглушку'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch.object(thumbnails, 'get_thumbnail') as get_thumbnail:
+            response = self.client.get(reverse('posts:index'))
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, PLACEHOLDER)
+
+        self.build(post)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, 'srcset=')
+        for variant in post.image_variants.all():
+            self.assertContains(response, f'{variant.url} {variant.width}w')
+
+    def test_placeholder_page_is_not_cached(self):
+        '''Страница с заглушкой не кэшируется и не получает валидаторов'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        self.addCleanup(response_cache.get_cache().clear)
+        guest = Client()
+        response = guest.get(reverse('posts:index'))
+        self.assertContains(response, PLACEHOLDER)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('no-store', response['Cache-Control'])
+
+        # Копии готовит другой процесс: версии здесь не сбрасываются
+        with mock.patch.object(thumbnails.cache, 'bump_post'):
+            self.build(post)
+        response = guest.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, 'srcset=')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_variants_sizes_and_formats(self):
+        '''Копии создаются для всех ширин и доступных форматов'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        self.build(post)
+        self.build(post)
+        formats = thumbnails.get_formats()
+        self.assertIn('JPEG', formats)
+        variants = post.image_variants.all()
+        self.assertEqual(
+            len(variants), len(settings.POST_IMAGE_WIDTHS) * len(formats)
+        )
+        for variant in variants:
+            self.assertIn(variant.width, settings.POST_IMAGE_WIDTHS)
+            self.assertEqual(
+                variant.height, round(variant.width * 339 / 960)
+            )
+        picture = thumbnails.get_picture(post)
+        self.assertEqual(picture['img'].format, formats[-1])
+        self.assertEqual(picture['img'].width, max(settings.POST_IMAGE_WIDTHS))
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_create_and_edit_schedule_variants(self):
+        '''Создание и правка поста с картинкой готовят копии в фоне'''
+        self.run_inline()
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой', 'image': make_image(),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        old = set(post.image_variants.values_list('name', flat=True))
+        self.assertTrue(old)
+
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Новая картинка', 'image': make_image('new.gif')},
+        )
+        new = set(post.image_variants.values_list('name', flat=True))
+        self.assertTrue(new)
+        self.assertFalse(old & new)
+
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Без картинки', 'image-clear': 'on'},
+        )
+        self.assertFalse(post.image_variants.exists())
+
+    def test_stale_job_is_skipped(self):
+        '''Задача для заменённой картинки ничего не сохраняет'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        thumbnails.generate(post.pk, 'posts/other.gif')
+        self.assertFalse(post.image_variants.exists())
+
+    def test_no_pool_by_default(self):
+        '''Без THUMBNAIL_WORKERS веб-процесс не обрабатывает картинки'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch.object(thumbnails, 'get_executor') as get_executor:
+            self.assertIsNone(thumbnails.get_picture(post))
+            thumbnails.schedule(post)
+        get_executor.assert_not_called()
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_post_without_image(self):
+        '''Для поста без картинки ничего не ставится в очередь'''
+        post = Post.objects.create(author=self.user, text='Без картинки')
+        with mock.patch.object(thumbnails, 'get_executor') as get_executor:
+            self.assertIsNone(thumbnails.get_picture(post))
+        get_executor.assert_not_called()
+
+    def test_build_command(self):
+        '''Команда build_image_variants обрабатывает старые картинки'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        call_command('build_image_variants', stdout=StringIO())
+        self.assertTrue(post.image_variants.exists())
+
+    def test_watch_takes_queue(self):
+        '''В режиме --watch копии готовятся по очереди, а не обходом постов'''
+        posts = []
+
+        def upload(interval):
+            if posts:
+                raise StopWatch
+            self.client.post(reverse('posts:post_create'), data={
+                'text': 'Из очереди', 'image': make_image(),
+            })
+            posts.append(Post.objects.get(text='Из очереди'))
+            # Пост без очереди берёт только полный обход при запуске
+            posts.append(Post.objects.create(
+                author=self.user, text='Мимо очереди', image=make_image()
+            ))
+
+        with mock.patch('time.sleep', side_effect=upload):
+            with self.assertRaises(StopWatch):
+                call_command(
+                    'build_image_variants', watch=True, stdout=StringIO()
+                )
+        queued, missed = posts
+        self.assertTrue(queued.image_variants.exists())
+        self.assertFalse(missed.image_variants.exists())
+        self.assertFalse(PendingImage.objects.exists())
+
+    def test_queue_follows_image(self):
+        '''Очередь хранит текущую картинку и чистится без неё'''
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        thumbnails.schedule(post)
+        self.assertEqual(post.pending_image.image, post.image.name)
+        post.image = ''
+        post.save()
+        thumbnails.schedule(post)
+        self.assertFalse(PendingImage.objects.exists())
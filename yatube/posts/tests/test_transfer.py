@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from posts.models import Comment, FeedItem, Follow, Group, Post
+from posts.search import get_backend
+from users.models import Profile
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='test_author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост со снегирями', group=cls.group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def clear_database(self):
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def import_data(self, source):
+        call_command('import_data', source, stdout=StringIO())
+
+    def assert_restored(self):
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertEqual(post.author.get_full_name(), 'Лев Толстой')
+        self.assertEqual(post.group.slug, self.group.slug)
+        comment = Comment.objects.get(pk=self.comment.pk)
+        self.assertEqual(comment.post_id, post.pk)
+        self.assertEqual(comment.created, self.comment.created)
+        self.assertTrue(Follow.objects.filter(
+            user__username='test_reader', author__username='test_author'
+        ).exists())
+        self.assertFalse(post.author.has_usable_password())
+        # Производные данные построены заново
+        self.assertEqual(Profile.objects.get(user=post.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(
+            list(get_backend().filter(Post.objects.all(), 'снегирь')),
+            [post],
+        )
+
+    def test_ndjson_round_trip(self):
+        '''Выгрузка NDJSON загружается в пустую базу без потерь'''
+        out = StringIO()
+        call_command('export_data', stdout=out, stderr=StringIO())
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [line['model'] for line in lines],
+            ['users', 'users', 'groups', 'posts', 'comments', 'follows'],
+        )
+        path = os.path.join(self.directory.name, 'dump.ndjson')
+        with open(path, 'w') as stream:
+            stream.write(out.getvalue())
+        self.clear_database()
+        self.import_data(path)
+        self.assert_restored()
+
+    def test_csv_round_trip(self):
+        '''Выгрузка CSV по таблицам загружается так же'''
+        call_command(
+            'export_data', format='csv', output=self.directory.name,
+            stderr=StringIO(),
+        )
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory.name, 'posts.csv')
+        ))
+        self.clear_database()
+        self.import_data(self.directory.name)
+        self.assert_restored()
+
+    def test_unknown_references_skipped(self):
+        '''Строки с неизвестным автором пропускаются'''
+        path = os.path.join(self.directory.name, 'dump.ndjson')
+        with open(path, 'w') as stream:
+            for row in (
+                {'model': 'posts', 'id': 1000, 'author': 'nobody',
+                 'group': None, 'text': 'Ничей', 'image': '',
+                 'pub_date': '2022-01-01T00:00:00Z'},
+                {'model': 'follows', 'user': 'test_reader',
+                 'author': 'test_reader'},
+            ):
+                stream.write(json.dumps(row) + '\n')
+        out = StringIO()
+        call_command('import_data', path, skip_derived=True, stdout=out)
+        self.assertFalse(Post.objects.filter(pk=1000).exists())
+        self.assertIn('posts: 0 строк, пропущено 1', out.getvalue())
+        self.assertIn('follows: 0 строк, пропущено 1', out.getvalue())
+
+    def test_profiles_without_derived(self):
+        '''Загруженные пользователи получают профиль и без пересчёта'''
+        out = StringIO()
+        call_command('export_data', stdout=out, stderr=StringIO())
+        path = os.path.join(self.directory.name, 'dump.ndjson')
+        with open(path, 'w') as stream:
+            stream.write(out.getvalue())
+        self.clear_database()
+        call_command('import_data', path, skip_derived=True, stdout=out)
+        self.assertEqual(
+            set(Profile.objects.values_list('user__username', flat=True)),
+            {'test_author', 'test_reader'},
+        )
+
+    def test_existing_rows_not_counted(self):
+        '''Уже имеющиеся строки считаются пропущенными, а не загруженными'''
+        out = StringIO()
+        call_command('export_data', stdout=out, stderr=StringIO())
+        path = os.path.join(self.directory.name, 'dump.ndjson')
+        with open(path, 'w') as stream:
+            stream.write(out.getvalue())
+        out = StringIO()
+        call_command('import_data', path, skip_derived=True, stdout=out)
+        for name, skipped in (('users', 2), ('groups', 1), ('posts', 1),
+                              ('comments', 1), ('follows', 1)):
+            with self.subTest(name=name):
+                self.assertIn(
+                    f'{name}: 0 строк, пропущено {skipped}', out.getvalue()
+                )
+
+    def test_sequences_reset(self):
+        '''После загрузки с явными id счётчики id сдвигаются'''
+        out = StringIO()
+        call_command('export_data', stdout=out, stderr=StringIO())
+        path = os.path.join(self.directory.name, 'dump.ndjson')
+        with open(path, 'w') as stream:
+            stream.write(out.getvalue())
+        self.clear_database()
+        with mock.patch.object(
+            connection.ops, 'sequence_reset_sql', return_value=[]
+        ) as sequence_reset_sql:
+            self.import_data(path)
+        _, models = sequence_reset_sql.call_args[0]
+        self.assertEqual(list(models), [Post, Comment])
+        post = Post.objects.create(
+            author=User.objects.get(username='test_author'), text='Новый пост'
+        )
+        self.assertGreater(post.pk, self.post.pk)
@@ -3,10 +3,12 @@ import tempfile
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from posts import follows, graph
 from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
@@ -228,6 +230,31 @@ class TestView(TestCase):
         ))
         self.assertEqual(Follow.objects.count(), 0)
 
+    def test_profile_following_is_per_viewer(self):
+        '''Кнопка подписки зависит от того, кто смотрит профиль'''
+        cache.clear()
+        reader = User.objects.get(username='NewUser')
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.new_user_auntificated.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user}
+        ))
+        for client, following in (
+            (self.new_user_auntificated, True),
+            (self.quest_user, False),
+            (self.user_auntificated, False),
+        ):
+            with self.subTest(following=following):
+                response = client.get(url)
+                self.assertEqual(response.context['following'], following)
+        # Подписки читателя уже в кэше
+        with self.assertNumQueries(0):
+            self.assertTrue(follows.is_following(reader, self.user))
+        self.new_user_auntificated.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user}
+        ))
+        response = self.new_user_auntificated.get(url)
+        self.assertFalse(response.context['following'])
+
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -296,3 +323,50 @@ class ImagePagesTest(TestCase):
             Post.objects.filter(text='Тестовый текст',
                                 image='posts/small.gif').exists()
         )
+
+
+class FeedQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.reader = User.objects.create(username='reader')
+        for i in range(3):
+            author = User.objects.create(username=f'author_{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            for j in range(11):
+                Post.objects.create(
+                    author=author, group=cls.group, text=f'Пост {i}-{j}'
+                )
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+        # Снимок графа подписок строится один раз на процесс
+        graph.get_graph()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feed_query_count(self):
+        '''Число запросов лент не зависит от числа постов на странице'''
+        # В каждой ленте +1 запрос ключей для окна страниц, в подписках
+        # ещё +1 — примерное число записей; анониму профиль не проверяет
+        # подписку
+        feeds = (
+            (self.guest_client, reverse('posts:index'), 5),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}), 6),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': self.author}), 6),
+            (self.reader_client, reverse('posts:follow_index'), 7),
+        )
+        for client, url, queries in feeds:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(len(response.context['page_obj']), 10)
@@ -0,0 +1,187 @@
+"""Фоновая подготовка уменьшенных копий картинок постов.
+
+Для каждой картинки создаются копии нескольких ширин
+(``POST_IMAGE_WIDTHS``) в форматах ``POST_IMAGE_FORMATS``; их размеры
+сохраняются в ``ImageVariant``. Пока копий нет, шаблоны показывают
+заглушку.
+
+Загруженная картинка попадает в очередь ``PendingImage``. Её забирает
+отдельный процесс ``build_image_variants --watch``, а при
+``THUMBNAIL_WORKERS > 0`` копии сразу после сохранения готовит пул потоков
+веб-процесса.
+
+Сброс версий из отдельного процесса не дойдёт до веб-процессов, если
+кэш у каждого свой, поэтому страница с заглушкой помечается
+(:func:`mark_pending`) и не кэшируется ни фрагментом ленты, ни целиком,
+а валидаторов условного GET не получает.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+
+from . import cache
+from .models import ImageVariant, PendingImage, Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра в лентах
+FRAME = (960, 339)
+OPTIONS = {'crop': 'center', 'upscale': True}
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+SIZES = f'(max-width: {FRAME[0]}px) 100vw, {FRAME[0]}px'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+PENDING_ATTR = '_pending_images'
+
+
+def get_formats():
+    """Форматы из настроек, которые умеет сохранять Pillow."""
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name != 'WEBP' or features.check('webp')
+    ]
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def get_picture(post):
+    """Данные для ``<picture>`` картинки поста или None.
+
+    Использует предзагруженные ``image_variants``; если копий ещё нет,
+    ставит их в очередь.
+    """
+    if not post.image:
+        return None
+    variants = list(post.image_variants.all())
+    if not variants:
+        _submit(post)
+        return None
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(variant)
+    formats = [name for name in get_formats() if name in by_format]
+    if not formats:
+        return None
+    fallback = by_format[formats[-1]]
+    return {
+        'sources': [{
+            'type': MIME_TYPES.get(name, ''),
+            'srcset': ', '.join(
+                f'{variant.url} {variant.width}w'
+                for variant in by_format[name]
+            ),
+        } for name in formats],
+        'img': fallback[-1],
+        'sizes': SIZES,
+    }
+
+
+def schedule(post):
+    """Удаляет копии прежней картинки и ставит новую в очередь."""
+    post.image_variants.all().delete()
+    if post.image:
+        PendingImage.objects.update_or_create(
+            post=post, defaults={'image': post.image.name}
+        )
+    else:
+        PendingImage.objects.filter(post=post).delete()
+    _submit(post)
+
+
+def _submit(post):
+    """Отдаёт картинку пулу потоков после фиксации транзакции."""
+    if not post.image or not settings.THUMBNAIL_WORKERS:
+        return
+    job = (post.pk, post.image.name)
+    with _lock:
+        if job in _pending:
+            return
+        _pending.add(job)
+    transaction.on_commit(lambda: get_executor().submit(run_job, *job))
+
+
+def mark_pending(request):
+    """Отмечает, что в ответ на ``request`` попала заглушка."""
+    if request is not None:
+        setattr(request, PENDING_ATTR, True)
+
+
+def has_pending(request):
+    return getattr(request, PENDING_ATTR, False)
+
+
+def generate(post_id, image_name):
+    """Создаёт копии и сбрасывает ленты, где висела заглушка.
+
+    Возвращает True, если копии сохранены.
+    """
+    started = time.perf_counter()
+    result = 'failed'
+    try:
+        post = Post.objects.filter(pk=post_id, image=image_name).first()
+        if post is None:
+            # Пост удалён или картинку уже заменили
+            result = 'skipped'
+            return False
+        variants = []
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * FRAME[1] / FRAME[0])
+            for name in get_formats():
+                thumbnail = get_thumbnail(
+                    post.image, f'{width}x{height}', format=name, **OPTIONS
+                )
+                variants.append(ImageVariant(
+                    post=post, name=thumbnail.name, format=name,
+                    width=thumbnail.width, height=thumbnail.height,
+                ))
+        with transaction.atomic():
+            # Картинку могли заменить, пока готовились копии
+            if not Post.objects.filter(pk=post_id, image=image_name).exists():
+                result = 'skipped'
+                return False
+            post.image_variants.all().delete()
+            ImageVariant.objects.bulk_create(variants)
+        cache.bump_post(post)
+        result = 'saved'
+        return True
+    except Exception:
+        logger.exception('Не удалось обработать картинку поста %s', post_id)
+        return False
+    finally:
+        if result != 'failed':
+            # Неудачная картинка остаётся в очереди до перезапуска
+            PendingImage.objects.filter(
+                post_id=post_id, image=image_name
+            ).delete()
+        metrics.THUMBNAIL_SECONDS.observe(
+            time.perf_counter() - started, result=result
+        )
+        with _lock:
+            _pending.discard((post_id, image_name))
+
+
+def run_job(post_id, image_name):
+    """:func:`generate` для рабочего потока: закрывает его соединения."""
+    try:
+        return generate(post_id, image_name)
+    finally:
+        connections.close_all()
@@ -0,0 +1,286 @@
+"""Выгрузка и загрузка пользователей, групп, постов, комментариев и подписок.
+
+Записи идут потоком: выгрузка читает таблицы ``iterator()``, загрузка
+копит пачки по ``batch_size`` и пишет их ``bulk_create``. Связи
+передаются естественными ключами (имя пользователя, слаг группы), id
+постов и комментариев сохраняются, поэтому загружать удобно в пустую
+базу, например на стенде; после загрузки счётчики id этих таблиц
+сдвигаются за наибольший загруженный.
+
+``bulk_create`` не шлёт сигналов, поэтому профили пользователей
+создаются тут же, а счётчики, ленты подписок и поисковый индекс при
+загрузке не трогаются — их заново строит :func:`rebuild_derived` одним
+проходом в конце.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from operator import attrgetter
+
+from core import response_cache
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from users.models import Profile
+
+from . import cache, counters, feed, follows, graph
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend as get_search_backend
+
+# (имя, модель, колонки файла, поля для values_list) в порядке загрузки:
+# каждая таблица ссылается только на предыдущие
+TABLES = (
+    ('users', User,
+     ('username', 'first_name', 'last_name', 'date_joined'),
+     ('username', 'first_name', 'last_name', 'date_joined')),
+    ('groups', Group,
+     ('slug', 'title', 'description'),
+     ('slug', 'title', 'description')),
+    ('posts', Post,
+     ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+     ('id', 'author__username', 'group__slug', 'text', 'pub_date',
+      'image')),
+    ('comments', Comment,
+     ('id', 'post', 'author', 'text', 'created'),
+     ('id', 'post_id', 'author__username', 'text', 'created')),
+    ('follows', Follow,
+     ('user', 'author'),
+     ('user__username', 'author__username')),
+)
+TABLE_NAMES = tuple(name for name, *_ in TABLES)
+# Поля, по которым загружаемая строка может совпасть с уже имеющейся
+UNIQUE_FIELDS = {
+    'users': ('username',),
+    'groups': ('slug',),
+    'posts': ('id',),
+    'comments': ('id',),
+    'follows': ('user_id', 'author_id'),
+}
+# Таблицы, которые загружаются с id из файла
+EXPLICIT_IDS = {'posts': Post, 'comments': Comment}
+# Сколько значений ставить в один IN: старые SQLite принимают
+# не больше 999 параметров в запросе
+LOOKUP_CHUNK = 500
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """Пишет даты с микросекундами, а не обрезает до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_rows(name, batch_size=2000):
+    """Строки таблицы ``name`` словарями «колонка — значение»."""
+    _, model, columns, lookups = TABLES[TABLE_NAMES.index(name)]
+    rows = model.objects.order_by('pk').values_list(*lookups)
+    for row in rows.iterator(chunk_size=batch_size):
+        yield dict(zip(columns, row))
+
+
+@contextmanager
+def keep_dates():
+    """Не даёт ``auto_now_add`` заменить даты из файла текущим временем."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загружает записи пачками; ссылки разрешает по ходу загрузки.
+
+    Строки с неизвестными пользователями и уже имеющиеся в базе
+    пропускаются и считаются в ``skipped``, в ``loaded`` — только
+    записанные; неизвестные группа поста и пост комментария обнуляются,
+    как при их удалении.
+    """
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.pending = {name: [] for name in TABLE_NAMES}
+        self.loaded = dict.fromkeys(TABLE_NAMES, 0)
+        self.skipped = dict.fromkeys(TABLE_NAMES, 0)
+        self.user_ids = {}
+        self.group_ids = {}
+        self.post_ids = set()
+
+    def add(self, name, row):
+        # В CSV пустая ссылка — пустая строка, а id — строка цифр
+        for column in ('group', 'post'):
+            if row.get(column) == '':
+                row[column] = None
+        for column in ('id', 'post'):
+            if row.get(column) is not None:
+                row[column] = int(row[column])
+        self.pending[name].append(row)
+        if len(self.pending[name]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Пишет накопленное; зависимости — раньше ссылающихся строк."""
+        with keep_dates(), transaction.atomic():
+            with_ids = []
+            for name in TABLE_NAMES:
+                rows, self.pending[name] = self.pending[name], []
+                if rows:
+                    getattr(self, f'_load_{name}')(rows)
+                    if name in EXPLICIT_IDS:
+                        with_ids.append(EXPLICIT_IDS[name])
+            reset_sequences(*with_ids)
+
+    def _existing(self, model, fields, keys):
+        """Какие из ``keys`` (значений ``fields``) уже есть в базе."""
+        column = fields[0]
+        firsts = list({key[0] for key in keys} if len(fields) > 1 else keys)
+        existing = set()
+        for start in range(0, len(firsts), LOOKUP_CHUNK):
+            existing.update(model.objects.filter(**{
+                f'{column}__in': firsts[start:start + LOOKUP_CHUNK]
+            }).values_list(*fields, flat=len(fields) == 1))
+        return existing
+
+    def _save(self, name, model, objects):
+        fields = UNIQUE_FIELDS[name]
+        key = attrgetter(*fields)
+        unique = {}
+        total = 0
+        for obj in objects:
+            unique.setdefault(key(obj), obj)
+            total += 1
+        existing = self._existing(model, fields, list(unique))
+        objects = [obj for k, obj in unique.items() if k not in existing]
+        # Размер пачки INSERT бэкенд выбирает сам: у SQLite он ограничен.
+        # ignore_conflicts — на случай строк, записанных параллельно
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        self.loaded[name] += len(objects)
+        self.skipped[name] += total - len(objects)
+        return objects
+
+    def _resolve(self, ids, model, key, values):
+        missing = list({value for value in values if value} - ids.keys())
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            ids.update(model.objects.filter(**{
+                f'{key}__in': missing[start:start + LOOKUP_CHUNK]
+            }).values_list(key, 'pk'))
+
+    def _resolved(self, name, rows, **refs):
+        """Строки, у которых нашлись все обязательные ссылки ``refs``."""
+        for row in rows:
+            if all(row[column] in ids for column, ids in refs.items()):
+                yield row
+            else:
+                self.skipped[name] += 1
+
+    def _load_users(self, rows):
+        users = self._save('users', User, (
+            User(password=make_password(None), **row) for row in rows
+        ))
+        # Профиль обычно создаёт сигнал, а bulk_create его не шлёт; id
+        # новых пользователей всё равно понадобятся постам
+        usernames = [user.username for user in users]
+        self._resolve(self.user_ids, User, 'username', usernames)
+        Profile.objects.bulk_create(
+            (Profile(user_id=self.user_ids[username])
+             for username in usernames if username in self.user_ids),
+            ignore_conflicts=True,
+        )
+
+    def _load_groups(self, rows):
+        self._save('groups', Group, (Group(**row) for row in rows))
+
+    def _load_posts(self, rows):
+        self._resolve(self.user_ids, User, 'username',
+                      [row['author'] for row in rows])
+        self._resolve(self.group_ids, Group, 'slug',
+                      [row['group'] for row in rows])
+        posts = [
+            Post(
+                id=row['id'],
+                author_id=self.user_ids[row['author']],
+                group_id=self.group_ids.get(row['group']),
+                text=row['text'],
+                pub_date=row['pub_date'],
+                image=row['image'] or '',
+            )
+            for row in self._resolved('posts', rows, author=self.user_ids)
+        ]
+        self._save('posts', Post, posts)
+        # Уже имевшиеся посты тоже годятся для комментариев
+        self.post_ids.update(post.id for post in posts)
+
+    def _load_comments(self, rows):
+        self._resolve(self.user_ids, User, 'username',
+                      [row['author'] for row in rows])
+        missing = list(
+            {row['post'] for row in rows if row['post']} - self.post_ids
+        )
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            self.post_ids.update(Post.objects.filter(
+                pk__in=missing[start:start + LOOKUP_CHUNK]
+            ).values_list('pk', flat=True))
+        self._save('comments', Comment, (
+            Comment(
+                id=row['id'],
+                post_id=row['post'] if row['post'] in self.post_ids else None,
+                author_id=self.user_ids[row['author']],
+                text=row['text'],
+                created=row['created'],
+            )
+            for row in self._resolved(
+                'comments', rows, author=self.user_ids
+            )
+        ))
+
+    def _load_follows(self, rows):
+        self._resolve(self.user_ids, User, 'username',
+                      [row[column] for row in rows
+                       for column in ('user', 'author')])
+        self.skipped['follows'] += sum(
+            row['user'] == row['author'] for row in rows
+        )
+        objects = [
+            Follow(user_id=self.user_ids[row['user']],
+                   author_id=self.user_ids[row['author']])
+            for row in self._resolved(
+                'follows', [row for row in rows
+                            if row['user'] != row['author']],
+                user=self.user_ids, author=self.user_ids,
+            )
+        ]
+        objects = self._save('follows', Follow, objects)
+        follows.invalidate(*{follow.user_id for follow in objects})
+        graph.reset()
+
+
+def reset_sequences(*models):
+    """Сдвигает счётчики id ``models`` за наибольший id в таблице.
+
+    Нужно после вставки с явными id: иначе PostgreSQL выдаст следующему
+    посту уже занятый id. SQLite берёт следующий id из таблицы сам.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Заново строит счётчики, ленты подписок, поиск и сбрасывает кэши."""
+    started = time.perf_counter()
+    # Одна транзакция вместо фиксации на каждую подписку
+    with transaction.atomic():
+        counters.recount()
+        feed.rebuild()
+        get_search_backend().rebuild()
+    cache.get_cache().clear()
+    response_cache.get_cache().clear()
+    return time.perf_counter() - started
@@ -1,30 +1,75 @@
+from urllib.parse import urlencode
+
+from core.paginator import CursorPaginator
+from core.response_cache import cache_anonymous
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import conditional, follows, graph, thumbnails
+from .feed import FeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Group, Post, User
+from .search import get_backend as get_search_backend
 
 NUMBER_OF_POSTS: int = 10
+NUMBER_OF_COMMENTS: int = 20
+NUMBER_OF_USERS: int = 20
+NUMBER_OF_SUGGESTIONS: int = 5
+
 
+def get_page(request, queryset, **kwargs):
+    """Страница ленты по курсору из ``?cursor=``."""
+    paginator = CursorPaginator(
+        queryset, NUMBER_OF_POSTS,
+        count_timeout=settings.PAGINATOR_COUNT_TIMEOUT, **kwargs
+    )
+    return paginator.get_page(request.GET.get('cursor'))
 
+
+def get_comments_page(request, post_id, per_page=NUMBER_OF_COMMENTS):
+    """Страница комментариев поста по курсору из ``?cursor=``."""
+    comment_list = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post', 'author__username')
+    paginator = CursorPaginator(
+        comment_list, per_page, ordering=('created', 'pk')
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@cache_anonymous
+@conditional.feed_condition(conditional.index_state)
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {'query': query}
+    if query:
+        post_list = get_search_backend().search(
+            Post.objects.for_feed(), query
+        )
+        context['page_obj'] = get_page(
+            request, post_list, ordering=('-rank', '-pk')
+        )
+        context['page_query'] = urlencode({'q': query}) + '&'
+    return render(request, 'posts/search.html', context)
+
+
+@cache_anonymous
+@conditional.feed_condition(conditional.group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.order_by('-pub_date')
-    paginator = Paginator(group_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group_list = group.posts.for_feed()
+    page_obj = get_page(request, group_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -32,25 +77,64 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous
+@conditional.feed_condition(conditional.profile_state)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author).order_by('-pub_date')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = author.following.exists()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts = author.posts.for_feed()
+    page_obj = get_page(request, posts)
+    following = follows.is_following(request.user, author)
+    follows_you = (
+        request.user.is_authenticated
+        and graph.get_graph().follows(author.pk, request.user.pk)
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'follows_you': follows_you,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def follow_list(request, username, followers):
+    author = get_object_or_404(User, username=username)
+    snapshot = graph.get_graph()
+    if followers:
+        ids = snapshot.followers_of(author.pk)
+    else:
+        ids = snapshot.following_of(author.pk)
+    page_obj = graph.users_page(
+        ids, request.GET.get('page'), NUMBER_OF_USERS
+    )
+    for user in page_obj:
+        user.mutual = snapshot.is_mutual(author.pk, user.pk)
+    context = {
+        'author': author,
+        'followers': followers,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def author_followers(request, username):
+    return follow_list(request, username, followers=True)
+
+
+def author_following(request, username):
+    return follow_list(request, username, followers=False)
+
+
+@cache_anonymous
+@conditional.feed_condition(conditional.post_state)
 def post_detail(request, post_id):
-    post_obj = get_object_or_404(Post, pk=post_id)
+    post_obj = get_object_or_404(
+        Post.objects.for_feed().select_related('author__profile'), pk=post_id
+    )
     form = CommentForm()
-    comments = Comment.objects.filter(post=post_obj)
+    comments = get_comments_page(request, post_obj.pk)
     context = {
         'post_obj': post_obj,
         'form': form,
@@ -67,6 +151,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            thumbnails.schedule(post)
             return redirect('posts:profile', post.author.username)
         return render(request, 'posts/post_create.html', {'form': form})
 
@@ -76,7 +161,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id)
 
@@ -97,11 +182,38 @@ def post_edit(request, post_id):
 
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('posts:post_detail', post_id=post_id)
         return render(request, 'posts/post_create.html', context)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё».
+
+    Отдаёт фрагмент HTML, а при ``?format=json`` — JSON.
+    """
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = get_comments_page(request, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            } for comment in page],
+            'next_cursor': page.next_cursor,
+        })
+    context = {
+        'comments': page,
+        'post_id': post_id,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -116,29 +228,32 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    follower = Follow.objects.filter(user=request.user).values_list(
-        'author_id', flat=True
+    paginator = FeedPaginator(
+        request.user, NUMBER_OF_POSTS,
+        count_timeout=settings.PAGINATOR_COUNT_TIMEOUT,
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    suggested = graph.get_graph().suggestions(
+        request.user.pk, NUMBER_OF_SUGGESTIONS
     )
-    posts = Post.objects.filter(author_id__in=follower).order_by('-pub_date')
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    users = User.objects.in_bulk(suggested) if suggested else {}
     context = {
         'page_obj': page_obj,
+        'suggestions': [users[pk] for pk in suggested if pk in users],
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    if not follows.follow(request.user, [username]):
+        # Уже подписан или это он сам; автора может и не быть
+        get_object_or_404(User, username=username)
     return redirect('posts:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.get(user=request.user, author=author).delete()
+    if not follows.unfollow(request.user, [username]):
+        get_object_or_404(User, username=username)
     return redirect('posts:follow_index')
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -40,9 +41,52 @@ ALLOWED_HOSTS = [
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Фрагменты лент; инвалидируются версиями, TTL лишь страховка
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+        'TIMEOUT': 60 * 60 * 24,
+    },
+    # Целые страницы для анонимов; инвалидируются версиями путей
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 60 * 60,
+    },
 }
 
+# Общий для всех воркеров кэш по протоколу Redis, например
+# CACHE_URL=redis://127.0.0.1:6379/0; без него у каждого процесса свой
+# LocMemCache. Миниатюры sorl-thumbnail хранятся в кэше 'default'.
+CACHE_URL = os.getenv('CACHE_URL')
+
+if CACHE_URL:
+    CACHES = {
+        alias: {
+            'BACKEND': 'core.redis_cache.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': f'yatube:{alias}',
+            'VERSION': 1,
+            'TIMEOUT': CACHES[alias].get('TIMEOUT', 300),
+            'OPTIONS': {
+                'MAX_CONNECTIONS': int(os.getenv('CACHE_MAX_CONNECTIONS', 20)),
+                'SOCKET_TIMEOUT': 1,
+            },
+        }
+        for alias in CACHES
+    }
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# Сколько секунд обратный прокси может отдавать анонимам страницы лент
+# и постов без перепроверки; браузеры перепроверяют их по ETag всегда
+FEED_PROXY_MAX_AGE = 60
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Сколько секунд остальные запросы ждут, пока промах рендерит один
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
 
 # Application definition
 
@@ -51,6 +95,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -61,15 +106,32 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.response_cache.AnonymousResponseCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Профилирование SQL, шаблонов и кэша (см. core.profiling); только для
+# отладки: каждый запрос пишется в память процесса
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED') == '1'
+# Сколько последних запросов показывать на странице профилей
+PROFILING_HISTORY = 100
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(1, 'core.profiling.ProfilingMiddleware')
+
+# Файлы метрик всех процессов (см. core.metrics); очищать при деплое
+METRICS_DIR = os.getenv('METRICS_DIR') or os.path.join(
+    tempfile.gettempdir(), 'yatube-metrics'
+)
+# Если задан, /metrics отдаётся только с Authorization: Bearer <токен>
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 ROOT_URLCONF = 'yatube.urls'
@@ -82,8 +144,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Кэш разобранных шаблонов включён и при DEBUG; прогревается
+            # при старте воркера (core.template_warmup)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -150,3 +219,55 @@ LOGIN_REDIRECT_URL = 'posts:index'
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Приём файла больше этого размера прерывается, не дочитывая его
+FILE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Наибольшее число пикселей картинки поста; проверяется по заголовку
+# файла до декодирования
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Сколько секунд кэшируется приблизительное число записей в лентах;
+# None отключает подсчёт
+PAGINATOR_COUNT_TIMEOUT = 60
+
+# Сколько секунд хранится множество авторов, на которых подписан
+# читатель. При подписке и отписке оно сбрасывается сразу, но без
+# CACHE_URL только в своём процессе: другие увидят изменение по истечении
+# срока
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 if CACHE_URL else 10
+
+# Граф подписок в памяти процесса догоняет базу по журналу изменений в
+# кэше; при большем отставании или потере журнала строится заново
+FOLLOW_GRAPH_MAX_REPLAY = 1000
+FOLLOW_GRAPH_CHANGE_TIMEOUT = 60 * 60
+# Снимок старше этого числа секунд строится заново: без CACHE_URL журнал у
+# каждого процесса свой, и чужие подписки видны только после перестройки
+FOLLOW_GRAPH_MAX_AGE = 10 * 60 if CACHE_URL else 60
+# Сколько самых читаемых авторов снимок держит для «кого почитать»
+FOLLOW_GRAPH_POPULAR = 100
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам читателей, а подмешиваются при чтении ленты
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+FEED_BACKFILL_LIMIT = 1000
+
+# Бэкенд полнотекстового поиска по постам; на Postgres —
+# 'posts.search.PostgresSearchBackend'
+SEARCH_BACKEND = 'posts.search.SQLiteSearchBackend'
+
+# Сколько потоков веб-процесса готовят копии картинок постов. При 0 (по
+# умолчанию) их готовит только отдельный процесс
+# python manage.py build_image_variants --watch; без него вместо картинок
+# так и останутся заглушки
+THUMBNAIL_WORKERS = 0
+# Ширины уменьшенных копий картинок постов для srcset
+POST_IMAGE_WIDTHS = (320, 640, 960)
+# Форматы копий по убыванию предпочтения; последний идёт в <img>.
+# Форматы, которые не поддерживает установленный Pillow, пропускаются
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
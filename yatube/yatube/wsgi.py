@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны разбираются сейчас, а не на первом запросе к каждой странице
+from core.template_warmup import warm  # noqa: E402
+
+warm()